@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Build-up animations of brick layouts.
+
+Draws a saved .bricks layout (see brick_layout.py) as an animation in
+which the logo assembles row by row from the bottom, in the order the
+brick SVG is drawn in:
+
+- Animated WebP and GIF are painted into one canvas (see
+  brick_blockify.paint_brick_rows). Each frame holds only the band of
+  pixels the new row of bricks touched, placed at its offset over the
+  previous frames. The frames are encoded and written out one by one, so
+  rendering takes about as long as one still image and memory does not
+  grow with the number of rows.
+- SVG output wraps every row of bricks in a group that CSS shows after
+  the rows below it (see iter_brick_svg's row_delay).
+"""
+
+import sys
+import itertools
+import os
+import struct
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+import brick_layout
+from brick_blockify import (DEFAULT_WEBP_EFFORT, brick_raster_canvas, brick_svg_size, canvas_to_rgba,
+                            encode_raster, image_to_arrays, iter_brick_svg, paint_brick_rows, write_brick_svg)
+
+
+DEFAULT_FRAME_MS = 80  # delay between rows
+DEFAULT_HOLD_MS = 2000  # time the finished logo is shown before the animation loops
+
+# GIF frames use this many colors; the next palette index is transparent
+GIF_COLORS = 255
+
+# Pixels below this alpha are transparent in GIF frames (GIF has no partial transparency)
+GIF_MIN_ALPHA = 128
+
+FORMATS = ('.webp', '.gif', '.svg', '.svgz')
+
+
+def iter_frames(brick_sizes, rgb, output_width, block_width=24, block_height=20, cull=False,
+                frame_ms=DEFAULT_FRAME_MS, hold_ms=DEFAULT_HOLD_MS, align=1, supersample=2):
+    """Yield the frames of a build-up animation, one per row of bricks, bottom row first.
+
+    The first frame covers the whole image, so every loop starts from a
+    cleared canvas; later frames are the output rows the new row of bricks
+    was painted on, with the rows below already drawn. All frames come from
+    one canvas that each row is painted into.
+
+    Args:
+        align: Frame tops are rounded down to a multiple of this (WebP
+            frame offsets must be even)
+
+    Yields:
+        (top, rgba, duration) - y offset in output pixels, (rows, width, 4)
+        uint8 array and frame duration in ms (hold_ms for the last frame)
+    """
+    canvas = brick_raster_canvas(brick_sizes, output_width, block_width, block_height, supersample)
+    output_height = canvas.shape[0] // supersample
+
+    pending = None
+    for top, bottom in paint_brick_rows(canvas, brick_sizes, rgb, block_width, block_height, cull=cull):
+        top = top // supersample // align * align
+        bottom = -(-bottom // supersample)
+        band = canvas_to_rgba(canvas[top * supersample:bottom * supersample], supersample)
+        if pending is None:
+            # Nothing is drawn outside the first row yet
+            first = np.zeros((output_height, band.shape[1], 4), dtype=np.uint8)
+            first[top:bottom] = band
+            pending = (0, first)
+        else:
+            yield pending + (frame_ms,)
+            pending = (top, band)
+
+    if pending is None:
+        raise ValueError("Layout has no bricks to animate")
+    yield pending + (hold_ms,)
+
+
+def write_chunk(f, fourcc, data):
+    """Write one RIFF chunk (padded to an even size)."""
+    f.write(fourcc + struct.pack('<I', len(data)) + data)
+    if len(data) % 2:
+        f.write(b'\0')
+
+
+def webp_frame_chunks(data):
+    """Image data chunks (ALPH, VP8, VP8L) of a single-frame WebP file."""
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(data):
+        fourcc = data[pos:pos + 4]
+        size = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        if fourcc in (b'ALPH', b'VP8 ', b'VP8L'):
+            chunks.append(data[pos:pos + 8 + size + size % 2])
+        pos += 8 + size + size % 2
+    return b''.join(chunks)
+
+
+def write_webp_animation(frames, output_path, loop=0, webp_effort=None):
+    """Stream frames from iter_frames (with align=2) into an animated WebP file.
+
+    Every frame is encoded on its own (as by encode_raster) and stored as an
+    ANMF frame at its offset that replaces the pixels below it. The first
+    frame gives the canvas size.
+
+    Returns:
+        Number of frames written
+    """
+    first = next(frames)
+    height, width = first[1].shape[:2]
+    count = 0
+    with open(output_path, 'wb') as f:
+        f.write(b'RIFF\0\0\0\0WEBP')
+        # Animation and alpha flags, canvas size
+        write_chunk(f, b'VP8X', struct.pack('<B3x', 0x12) + (width - 1).to_bytes(3, 'little')
+                    + (height - 1).to_bytes(3, 'little'))
+        # Transparent background, loop count
+        write_chunk(f, b'ANIM', struct.pack('<4BH', 0, 0, 0, 0, loop))
+
+        for top, rgba, duration in itertools.chain([first], frames):
+            frame_data = encode_raster(Image.fromarray(rgba, 'RGBA'), 'webp', webp_effort)
+            header = b''.join(value.to_bytes(3, 'little')
+                              for value in (0, top // 2, width - 1, rgba.shape[0] - 1, duration))
+            # Flags: do not blend with the previous frame, no disposal
+            write_chunk(f, b'ANMF', header + b'\x02' + webp_frame_chunks(frame_data))
+            count += 1
+
+        riff_size = f.tell() - 8
+        f.seek(4)
+        f.write(struct.pack('<I', riff_size))
+    return count
+
+
+def gif_frame(rgba):
+    """Palette image of a frame for GIF, with index GIF_COLORS transparent."""
+    opaque = rgba[:, :, 3] >= GIF_MIN_ALPHA
+    rgb = np.where(opaque[:, :, None], rgba[:, :, :3], 0).astype(np.uint8)
+    quantized = Image.fromarray(rgb, 'RGB').quantize(GIF_COLORS, dither=Image.Dither.NONE)
+
+    index = np.array(quantized)
+    index[~opaque] = GIF_COLORS
+    palette = quantized.getpalette()[:GIF_COLORS * 3]
+    frame = Image.fromarray(index, 'P')
+    frame.putpalette(palette + [0] * (256 * 3 - len(palette)))
+    return frame
+
+
+def write_gif_animation(frames, output_path, loop=0):
+    """Stream frames from iter_frames into an animated GIF file.
+
+    Every frame is quantized on its own and written with a local color
+    table at its offset; its transparent pixels leave the frames below
+    visible, which is right since painting never makes a pixel more
+    transparent. The first frame gives the canvas size.
+
+    Returns:
+        Number of frames written
+    """
+    first = next(frames)
+    height, width = first[1].shape[:2]
+    if width > 0xFFFF or height > 0xFFFF:
+        raise ValueError(f"GIF images are at most 65535 pixels wide and high (got {width}×{height})")
+
+    count = 0
+    with open(output_path, 'wb') as f:
+        # GIF89a header without a global color table, then the loop count
+        f.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0))
+        f.write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\0')
+
+        for top, rgba, duration in itertools.chain([first], frames):
+            for data in GifImagePlugin.getdata(gif_frame(rgba), offset=(0, top), duration=duration,
+                                               transparency=GIF_COLORS, disposal=1, include_color_table=True):
+                f.write(data)
+            count += 1
+        f.write(b';')
+    return count
+
+
+def animate_layout(layout_path, output_path, block_width=24, block_height=20, symbols=False, cull=False,
+                   raster_width=None, compact=False, precision=None, frame_ms=DEFAULT_FRAME_MS,
+                   hold_ms=DEFAULT_HOLD_MS, loop=0, webp_effort=None):
+    """Render a saved .bricks layout as a build-up animation.
+
+    The output format follows the file extension: animated WebP or GIF
+    (raster_width pixels wide, default the SVG width) or CSS-animated SVG
+    (.svg, .svgz; symbols, compact and precision as for the brick SVG).
+
+    Args:
+        frame_ms: Milliseconds between rows of bricks
+        hold_ms: Milliseconds the finished logo is shown (WebP/GIF)
+        loop: Number of times WebP/GIF animations play (0 = forever)
+        webp_effort: None for lossy WebP frames, 0-6 for lossless (see encode_raster)
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported animation format: {output_path}")
+
+    layout = brick_layout.load_layout(layout_path)
+    img = brick_layout.layout_to_image(layout)
+    brick_sizes = brick_layout.layout_brick_sizes(layout, block_width)
+
+    if ext in ('.svg', '.svgz'):
+        write_brick_svg(iter_brick_svg(img, block_width=block_width, block_height=block_height,
+                                       brick_type=layout['brick_type'], symbols=symbols, cull=cull,
+                                       brick_sizes=brick_sizes, compact=compact, precision=precision,
+                                       row_delay=frame_ms),
+                        output_path)
+        print(f"Saved {layout_path} to {output_path} (CSS animation, {frame_ms} ms per row)")
+        return
+
+    raster_width = raster_width or brick_svg_size(img.width, img.height, block_width, block_height)[0]
+    _, rgb = image_to_arrays(img)
+    frames = iter_frames(brick_sizes, rgb, raster_width, block_width, block_height, cull=cull, frame_ms=frame_ms,
+                         hold_ms=hold_ms, align=2 if ext == '.webp' else 1)
+    if ext == '.webp':
+        count = write_webp_animation(frames, output_path, loop, webp_effort)
+    else:
+        count = write_gif_animation(frames, output_path, loop)
+    print(f"Saved {layout_path} to {output_path} ({count} frames, {frame_ms} ms per row)")
+
+
+def main(argv):
+    """Command line entry point: [options] <layout.bricks> <output> [block_width] [block_height]"""
+    args = [arg for arg in argv if not arg.startswith('--')]
+    options = {'frame_ms': DEFAULT_FRAME_MS, 'hold_ms': DEFAULT_HOLD_MS}
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name in ('--raster-width', '--precision', '--frame-ms', '--hold-ms', '--loop'):
+            options[name[2:].replace('-', '_')] = int(value)
+        elif arg == '--webp-lossless':
+            options['webp_effort'] = DEFAULT_WEBP_EFFORT
+        elif name == '--webp-lossless':
+            options['webp_effort'] = int(value)
+
+    if len(args) < 2:
+        print("Usage: python brick_blockify.py animate [--cull] [--symbols] [--compact] [--precision=N] [--raster-width=N]")
+        print("                                        [--frame-ms=N] [--hold-ms=N] [--loop=N] [--webp-lossless[=EFFORT]]")
+        print("                                        <layout.bricks> <output> [block_width] [block_height]")
+        print("  Animate a saved brick layout assembling row by row from the bottom")
+        print("  output: .webp/.gif (animated image) or .svg/.svgz (CSS animation)")
+        print("  --raster-width=N: Width of WebP/GIF output (default: the SVG width)")
+        print(f"  --frame-ms=N: Milliseconds between rows (default: {DEFAULT_FRAME_MS})")
+        print(f"  --hold-ms=N: Milliseconds the finished logo is shown in WebP/GIF (default: {DEFAULT_HOLD_MS})")
+        print("  --loop=N: Number of times WebP/GIF animations play (default: 0 = forever)")
+        print(f"  --webp-lossless[=EFFORT]: Lossless WebP frames, EFFORT 0-6 (default: {DEFAULT_WEBP_EFFORT})")
+        sys.exit(1)
+
+    animate_layout(args[0], args[1], int(args[2]) if len(args) > 2 else 24, int(args[3]) if len(args) > 3 else 20,
+                   symbols='--symbols' in argv, cull='--cull' in argv, compact='--compact' in argv, **options)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
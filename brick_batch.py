@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Batch generation of brick-style logo variants in a single interpreter.
+
+Reads a JSON manifest describing groups of input logos and their outputs
+(brick SVG, PNG, WebP) and processes them all without starting a new
+Python process per file. Independent variants can be spread over a
+process pool with --jobs, and unchanged variants are restored from the
+content-addressed build cache (see brick_cache.py). Colour variants of a
+logo (same shape and colour regions, different colours) are packed once
+and share their brick layout.
+"""
+
+import sys
+import contextlib
+import glob
+import io
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import brick_cache
+import brick_profile
+from brick_blockify import blockify_svg, blockify_svg_widths, export_raster
+from brick_blockify_full import process_full_logo, process_full_logo_widths
+
+
+# Job settings that affect the generated files (part of the cache key)
+RENDER_KEYS = ('pixel_width', 'block_width', 'block_height', 'brick_type', 'raster_width', 'full', 'symbols', 'cull',
+               'tile_rows', 'compact', 'precision', 'palette', 'webp_effort')
+
+# Defaults for optional manifest keys
+JOB_DEFAULTS = {
+    'pixel_width': 20,
+    'block_width': 24,
+    'block_height': 20,
+    'brick_type': 'auto',
+    'raster_width': None,
+    'full': False,
+    'symbols': False,
+    'cull': False,
+    'tile_rows': None,
+    'compact': False,
+    'precision': None,
+    'palette': None,
+    'webp_effort': None,
+}
+
+# Brick layouts shared by the jobs of one pool worker (see init_worker)
+_worker_layouts = None
+
+
+def load_manifest(manifest_path, groups=None):
+    """Expand a manifest into a list of jobs, one per input file.
+
+    Each group in the manifest has an "inputs" glob and output path templates
+    ("svg", "png", "webp", optionally "layout" for the .bricks layout) where
+    {name} is the input file name without extension. Inputs may also be raster
+    images (PNG, JPEG, ...), quantized to the brick colors of "palette".
+    "pixel_width" may be a list of widths, generated from one rasterization;
+    the templates then need a {width} placeholder.
+
+    Args:
+        manifest_path: Path to the JSON manifest
+        groups: Optional list of group names to keep (default: all groups)
+
+    Returns:
+        List of job dicts with the group settings filled in for each input
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    jobs = []
+    for group in manifest['groups']:
+        if groups and group['name'] not in groups:
+            continue
+
+        for input_svg in sorted(glob.glob(group['inputs'])):
+            name = os.path.splitext(os.path.basename(input_svg))[0]
+            job = dict(JOB_DEFAULTS)
+            job.update({key: value for key, value in group.items() if key != 'inputs'})
+            job['group'] = group['name']
+            job['name'] = name
+            job['input'] = input_svg
+            for output in ('svg', 'png', 'webp', 'layout'):
+                if job.get(output):
+                    job[output] = job[output].format(name=name, width='{width}')
+            jobs.append(job)
+
+    return jobs
+
+
+def job_widths(job):
+    """Pixel widths of a job (a single width unless the manifest gave a list)."""
+    return job['pixel_width'] if isinstance(job['pixel_width'], list) else [job['pixel_width']]
+
+
+def job_outputs(job, raster=True):
+    """Output files of a job as a dict of cache entry name -> output path."""
+    outputs = {}
+    with_raster = raster and job['raster_width'] and job.get('png') and job.get('webp')
+    for width in job_widths(job):
+        suffix = f'-{width}' if isinstance(job['pixel_width'], list) else ''
+        outputs[f'brick{suffix}.svg'] = job['svg'].format(width=width)
+        if with_raster:
+            outputs[f'brick{suffix}.png'] = job['png'].format(width=width)
+            outputs[f'brick{suffix}.webp'] = job['webp'].format(width=width)
+        if job.get('layout') and not job['full']:
+            outputs[f'brick{suffix}.bricks'] = job['layout'].format(width=width)
+    return outputs
+
+
+def run_job(job, raster=True, cache_dir=None, variant_layouts=None):
+    """Generate the brick SVG and (optionally) PNG/WebP outputs for one job.
+
+    With a cache_dir, outputs of a job whose input bytes and render settings
+    were seen before are copied from the cache instead of being regenerated.
+    variant_layouts is a dict shared between jobs, so a colour variant of a
+    logo packed by an earlier job reuses that brick layout.
+    """
+    outputs = job_outputs(job, raster)
+    if cache_dir:
+        settings = {key: job[key] for key in RENDER_KEYS}
+        if job['palette'] and os.path.exists(job['palette']):
+            # A palette file is keyed by its contents, like the input
+            settings['palette'] = brick_cache.file_digest(job['palette'])
+        job_key = brick_cache.cache_key('outputs', brick_cache.file_digest(job['input']), settings)
+        entry = brick_cache.lookup(cache_dir, job_key, outputs)
+        if entry is not None and brick_cache.restore(entry, outputs):
+            brick_profile.count('cache.output_hit')
+            for path in outputs.values():
+                brick_profile.output(path)
+            print(f"  Restored {len(outputs)} output(s) from cache")
+            return
+
+    for path in outputs.values():
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with_raster = any(name.endswith('.png') for name in outputs)
+
+    if job['full']:
+        if isinstance(job['pixel_width'], list):
+            process_full_logo_widths(job['input'], job['svg'], job['pixel_width'], job['block_width'],
+                                     job['block_height'], symbols=job['symbols'], cull=job['cull'],
+                                     variant_layouts=variant_layouts, compact=job['compact'],
+                                     precision=job['precision'])
+        else:
+            process_full_logo(job['input'], job['svg'], job['pixel_width'], job['block_width'], job['block_height'],
+                              symbols=job['symbols'], cull=job['cull'], cache_dir=cache_dir,
+                              tile_rows=job['tile_rows'], variant_layouts=variant_layouts, compact=job['compact'],
+                              precision=job['precision'])
+
+        # The vector subtitle is only in the SVG, so full logos are rasterized from it
+        if with_raster:
+            for width in job_widths(job):
+                print(f"  Converting to PNG and WebP ({job['raster_width']}px)...")
+                export_raster(job['svg'].format(width=width), job['png'].format(width=width),
+                              job['webp'].format(width=width), job['raster_width'], job['webp_effort'])
+    elif isinstance(job['pixel_width'], list):
+        # Size ladder: one rasterization, downscaled to every width
+        raster_args = {}
+        if with_raster:
+            raster_args = {'png_template': job['png'], 'webp_template': job['webp'],
+                           'raster_width': job['raster_width'], 'webp_effort': job['webp_effort']}
+        blockify_svg_widths(job['input'], job['svg'], job['pixel_width'], job['block_width'], job['block_height'],
+                            job['brick_type'], symbols=job['symbols'], cull=job['cull'],
+                            variant_layouts=variant_layouts, layout_template=job.get('layout'), compact=job['compact'],
+                            precision=job['precision'], palette=job['palette'], **raster_args)
+    else:
+        # PNG/WebP are drawn straight from the brick layout
+        raster_args = {}
+        if with_raster:
+            raster_args = {'png_path': job['png'], 'webp_path': job['webp'], 'raster_width': job['raster_width'],
+                           'webp_effort': job['webp_effort']}
+        blockify_svg(job['input'], job['svg'], job['pixel_width'], job['block_width'], job['block_height'],
+                     job['brick_type'], symbols=job['symbols'], cull=job['cull'], cache_dir=cache_dir,
+                     tile_rows=job['tile_rows'], variant_layouts=variant_layouts, layout_path=job.get('layout'),
+                     compact=job['compact'], precision=job['precision'], palette=job['palette'], **raster_args)
+
+    if cache_dir:
+        brick_cache.store(cache_dir, job_key, outputs)
+
+
+def run_job_profiled(job, raster=True, cache_dir=None, profile=False, variant_layouts=None):
+    """Run one job, returning its instrumentation report (None unless profile)."""
+    if not profile:
+        run_job(job, raster=raster, cache_dir=cache_dir, variant_layouts=variant_layouts)
+        return None
+
+    brick_profile.start(job['input'])
+    try:
+        run_job(job, raster=raster, cache_dir=cache_dir, variant_layouts=variant_layouts)
+    finally:
+        report = brick_profile.finish()
+    report['group'] = job['group']
+    return report
+
+
+def init_worker():
+    """Pool worker initializer: start with no shared brick layouts."""
+    global _worker_layouts
+    _worker_layouts = {}
+
+
+def run_job_logged(job, raster=True, cache_dir=None, profile=False):
+    """Run one job and return everything it printed and its report (used by pool workers)."""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        report = run_job_profiled(job, raster=raster, cache_dir=cache_dir, profile=profile,
+                                  variant_layouts=_worker_layouts)
+    return log.getvalue(), report
+
+
+def run_batch(jobs, raster=True, workers=1, cache_dir=None, cache_size=brick_cache.DEFAULT_CACHE_SIZE,
+              profile=None):
+    """Run all jobs, in this interpreter or spread over a process pool.
+
+    With workers > 1 each job runs in a pool worker with its output captured;
+    the logs are printed in manifest order as jobs finish, so the combined
+    log (and every output file) is the same as in a sequential run.
+
+    Colour variants share brick layouts between the jobs run in one
+    interpreter (each pool worker keeps its own) and, through the cache's
+    layout entries, across workers and runs.
+
+    With a cache_dir, the cache is trimmed to cache_size bytes afterwards.
+    With a profile path, the per-job instrumentation reports are written there.
+    """
+    if workers > 1 and len(jobs) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=init_worker)
+        results = pool.map(run_job_logged, jobs, itertools.repeat(raster), itertools.repeat(cache_dir),
+                           itertools.repeat(bool(profile)))
+    else:
+        pool = None
+        results = (None for _ in jobs)
+
+    reports = []
+    variant_layouts = {}
+    try:
+        group = None
+        for job, result in zip(jobs, results):
+            if job['group'] != group:
+                group = job['group']
+                print(f"=== Processing group: {group} ===")
+
+            print(f"Processing: {job['name']}")
+            if result is None:
+                report = run_job_profiled(job, raster=raster, cache_dir=cache_dir, profile=bool(profile),
+                                          variant_layouts=variant_layouts)
+            else:
+                log, report = result
+                print(log, end='')
+            if report is not None:
+                reports.append(report)
+            print("")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if cache_dir:
+        evicted = brick_cache.evict(cache_dir, cache_size)
+        if evicted:
+            print(f"Evicted {evicted} old cache entries from {cache_dir}")
+
+    print(f"=== Complete! ({len(jobs)} logo(s)) ===")
+
+    if profile:
+        brick_profile.write(profile, reports)
+
+
+def main(argv):
+    """Command line entry point: <manifest.json> [group ...] [--svg-only] [--jobs N] [--cache DIR] ..."""
+    args = []
+    profile = brick_profile.profile_path(argv)
+    raster = True
+    workers = os.cpu_count() or 1
+    cache_dir = brick_cache.DEFAULT_CACHE_DIR
+    cache_size = brick_cache.DEFAULT_CACHE_SIZE
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--svg-only':
+            raster = False
+        elif arg == '--jobs' and i + 1 < len(argv):
+            workers = int(argv[i + 1])
+            i += 1
+        elif arg.startswith('--jobs='):
+            workers = int(arg.split('=', 1)[1])
+        elif arg == '--no-cache':
+            cache_dir = None
+        elif arg == '--cache' and i + 1 < len(argv):
+            cache_dir = argv[i + 1]
+            i += 1
+        elif arg == '--cache-size' and i + 1 < len(argv):
+            cache_size = int(float(argv[i + 1]) * 1024 * 1024)
+            i += 1
+        elif arg == '--profile' or arg.startswith('--profile='):
+            pass  # read by brick_profile.profile_path above
+        else:
+            args.append(arg)
+        i += 1
+
+    if len(args) < 1:
+        print("Usage: python brick_batch.py <manifest.json> [group ...] [--svg-only] [--jobs N]")
+        print("                             [--cache DIR | --no-cache] [--cache-size MB] [--profile[=FILE]]")
+        print("  group: Only process the named manifest groups (default: all)")
+        print("  --svg-only: Skip PNG/WebP export")
+        print("  --jobs N: Number of worker processes (default: CPU count, 1 = sequential)")
+        print(f"  --cache DIR: Build cache directory (default: {brick_cache.DEFAULT_CACHE_DIR})")
+        print("  --no-cache: Always regenerate every output")
+        print(f"  --cache-size MB: Cache size limit, least recently used entries are evicted "
+              f"(default: {brick_cache.DEFAULT_CACHE_SIZE // (1024 * 1024)})")
+        print(f"  --profile[=FILE]: Write per-job stage timings and counters as JSON "
+              f"(default: {brick_profile.DEFAULT_PROFILE}, also ${brick_profile.ENV_VAR}=FILE)")
+        sys.exit(1)
+
+    jobs = load_manifest(args[0], groups=args[1:])
+    run_batch(jobs, raster=raster, workers=workers, cache_dir=cache_dir, cache_size=cache_size, profile=profile)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
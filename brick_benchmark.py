@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark the brick pipeline on the real logos.
+
+Every input logo is run through each brick type at a sweep of pixel widths.
+For each stage (rasterize, pack, generate, write) the best wall time over a
+few repeats and the peak Python/NumPy heap use (tracemalloc) are recorded,
+together with brick and SVG element counts. tracemalloc does not see native
+allocations such as the cairosvg surface, so every case is also built once
+in a fresh interpreter (streaming the SVG as the real builds do) to record
+its peak resident set size, the number to hold against a memory budget.
+Results are written as JSON so runs from different commits can be compared
+with the "compare" subcommand.
+"""
+
+import sys
+import glob
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import brick_cache
+from brick_blockify import (svg_data_to_image, image_to_arrays, compute_brick_grid, brick_type_counts,
+                            image_to_brick_svg, iter_brick_svg, write_brick_svg)
+
+
+DEFAULT_INPUTS = ('logo/square/svg/outlined/spy-square-*.svg', 'logo/horizontal/svg/outlined/spy-simple-*.svg')
+DEFAULT_WIDTHS = (20, 30, 100, 400, 1000)
+BRICK_TYPES = ('auto', 'optimal', '1x1', '2x2')
+DEFAULT_OUTPUT = 'brick-benchmark.json'
+
+# Pipeline stages in execution order
+STAGES = ('rasterize', 'pack', 'generate', 'write')
+
+# Stage time change (as a fraction) reported as a regression by "compare";
+# changes smaller than REGRESSION_MIN_SECONDS are treated as timing noise
+REGRESSION_THRESHOLD = 0.10
+REGRESSION_MIN_SECONDS = 0.005
+
+
+def measure(func, repeat=3):
+    """Run func repeat times untraced, then once under tracemalloc.
+
+    Returns:
+        (result, seconds, peak_bytes) - result of the last call, the best
+        wall time of the untraced runs and the traced peak heap growth
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def count_elements(svg_path):
+    """Number of SVG elements in a generated brick SVG (one element per line)."""
+    count = 0
+    with open(svg_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.lstrip()
+            if line.startswith('<') and not line.startswith(('</', '<?')):
+                count += 1
+    return count
+
+
+def benchmark_case(svg_data, pixel_width, brick_type, block_width=24, block_height=20, repeat=3):
+    """Benchmark one logo at one pixel width and brick type.
+
+    Returns:
+        Result dict (image size, brick counts, element count, output bytes, stages)
+    """
+    stages = {}
+
+    img, seconds, peak = measure(lambda: svg_data_to_image(svg_data, width=pixel_width), repeat)
+    stages['rasterize'] = {'seconds': seconds, 'python_heap_peak_bytes': peak}
+
+    opaque, rgb = image_to_arrays(img)
+    brick_sizes, seconds, peak = measure(lambda: compute_brick_grid(opaque, rgb, block_width, brick_type), repeat)
+    stages['pack'] = {'seconds': seconds, 'python_heap_peak_bytes': peak}
+
+    _, seconds, peak = measure(lambda: image_to_brick_svg(img, block_width, block_height, brick_type=brick_type,
+                                                          brick_sizes=brick_sizes), repeat)
+    stages['generate'] = {'seconds': seconds, 'python_heap_peak_bytes': peak}
+
+    fd, output_svg = tempfile.mkstemp(suffix='.svg')
+    os.close(fd)
+    try:
+        _, seconds, peak = measure(lambda: write_brick_svg(iter_brick_svg(img, block_width, block_height,
+                                                                          brick_type=brick_type,
+                                                                          brick_sizes=brick_sizes),
+                                                           output_svg), repeat)
+        stages['write'] = {'seconds': seconds, 'python_heap_peak_bytes': peak}
+        svg_bytes = os.path.getsize(output_svg)
+        elements = count_elements(output_svg)
+    finally:
+        os.unlink(output_svg)
+
+    bricks_by_type = brick_type_counts(brick_sizes, block_width)
+
+    return {
+        'image_size': list(img.size),
+        'bricks': sum(bricks_by_type.values()),
+        'bricks_by_type': bricks_by_type,
+        'elements': elements,
+        'svg_bytes': svg_bytes,
+        'stages': stages,
+    }
+
+
+def max_rss_bytes():
+    """Peak resident set size of this process so far, in bytes."""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def run_case_once(input_svg, pixel_width, brick_type, block_width=24, block_height=20):
+    """Build one case's SVG once, the way a build writes it (the body of a peak-rss subprocess).
+
+    The SVG is streamed to a file (write_brick_svg), as the CLI and batch
+    builds do. The in-memory document of image_to_brick_svg is left out,
+    since it would set a high-water mark no build reaches.
+
+    Returns:
+        Peak resident set size of this process in bytes
+    """
+    with open(input_svg, 'rb') as f:
+        svg_data = f.read()
+    img = svg_data_to_image(svg_data, width=pixel_width)
+    opaque, rgb = image_to_arrays(img)
+    brick_sizes = compute_brick_grid(opaque, rgb, block_width, brick_type)
+
+    fd, output_svg = tempfile.mkstemp(suffix='.svg')
+    os.close(fd)
+    try:
+        write_brick_svg(iter_brick_svg(img, block_width, block_height, brick_type=brick_type,
+                                       brick_sizes=brick_sizes), output_svg)
+    finally:
+        os.unlink(output_svg)
+    return max_rss_bytes()
+
+
+def peak_rss_case(input_svg, pixel_width, brick_type, block_width=24, block_height=20):
+    """Peak resident set size of one case, run in a fresh interpreter.
+
+    Includes the interpreter and imported modules, i.e. what a build
+    process running this case needs in total. A fresh process per case
+    keeps earlier (larger) cases from setting the high-water mark.
+
+    Returns:
+        Peak RSS in bytes
+    """
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), 'peak-rss', input_svg, str(pixel_width),
+                             brick_type, str(block_width), str(block_height)],
+                            check=True, capture_output=True, text=True)
+    return int(result.stdout.split()[-1])
+
+
+def run_benchmarks(inputs, widths=DEFAULT_WIDTHS, brick_types=BRICK_TYPES, repeat=3, rss=True):
+    """Benchmark every input at every pixel width and brick type.
+
+    Args:
+        rss: Also measure each case's peak RSS in a subprocess (see peak_rss_case)
+
+    Returns:
+        Report dict with environment info and one result per case
+    """
+    results = []
+    for input_svg in inputs:
+        with open(input_svg, 'rb') as f:
+            svg_data = f.read()
+
+        for pixel_width in widths:
+            for brick_type in brick_types:
+                print(f"Benchmarking {input_svg} at {pixel_width}px ({brick_type})...")
+                result = {'input': input_svg, 'pixel_width': pixel_width, 'brick_type': brick_type}
+                result.update(benchmark_case(svg_data, pixel_width, brick_type, repeat=repeat))
+                if rss:
+                    result['peak_rss_bytes'] = peak_rss_case(input_svg, pixel_width, brick_type)
+
+                total = sum(stage['seconds'] for stage in result['stages'].values())
+                peak = max(stage['python_heap_peak_bytes'] for stage in result['stages'].values())
+                summary = (f"  {result['bricks']} bricks, {result['elements']} elements, "
+                           f"{result['svg_bytes'] / 1024:.0f} KiB, {total * 1000:.1f} ms, "
+                           f"Python heap peak {peak / (1024 * 1024):.1f} MiB")
+                if rss:
+                    summary += f", peak RSS {result['peak_rss_bytes'] / (1024 * 1024):.1f} MiB"
+                print(summary)
+                results.append(result)
+
+    return {
+        'tool_version': brick_cache.tool_version(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def case_key(result):
+    """Key matching the same case across two reports."""
+    return (result['input'], result['pixel_width'], result['brick_type'])
+
+
+def compare_reports(base, new, threshold=REGRESSION_THRESHOLD):
+    """Print stage times of two reports side by side.
+
+    Returns:
+        Number of stages that got slower by more than threshold
+    """
+    base_results = {case_key(result): result for result in base['results']}
+    regressions = 0
+    for result in new['results']:
+        old = base_results.get(case_key(result))
+        if old is None:
+            continue
+
+        print(f"{result['input']} at {result['pixel_width']}px ({result['brick_type']}):")
+        for stage in STAGES:
+            before = old['stages'][stage]['seconds']
+            after = result['stages'][stage]['seconds']
+            change = (after - before) / before if before else 0.0
+            flag = ''
+            if change > threshold and after - before > REGRESSION_MIN_SECONDS:
+                flag = '  <-- slower'
+                regressions += 1
+            print(f"  {stage:10s} {before * 1000:9.2f} ms -> {after * 1000:9.2f} ms ({change:+.0%}){flag}")
+        if 'peak_rss_bytes' in result and 'peak_rss_bytes' in old:
+            print(f"  {'peak RSS':10s} {old['peak_rss_bytes'] / (1024 * 1024):9.1f} MiB -> "
+                  f"{result['peak_rss_bytes'] / (1024 * 1024):9.1f} MiB")
+        if result['elements'] != old['elements'] or result['svg_bytes'] != old['svg_bytes']:
+            print(f"  output changed: {old['elements']} -> {result['elements']} elements, "
+                  f"{old['svg_bytes']} -> {result['svg_bytes']} bytes")
+
+    return regressions
+
+
+def parse_list(value, convert=str):
+    """Parse a comma separated option value."""
+    return [convert(item) for item in value.split(',') if item]
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['compare']:
+        if len(sys.argv) != 4:
+            print("Usage: python brick_benchmark.py compare <base.json> <new.json>")
+            sys.exit(1)
+        with open(sys.argv[2]) as f:
+            base = json.load(f)
+        with open(sys.argv[3]) as f:
+            new = json.load(f)
+        regressions = compare_reports(base, new)
+        print(f"{regressions} stage(s) slower by more than {REGRESSION_THRESHOLD:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    if sys.argv[1:2] == ['peak-rss']:
+        # One case in this fresh interpreter (started by peak_rss_case)
+        input_svg, pixel_width, brick_type, block_width, block_height = sys.argv[2:7]
+        print(run_case_once(input_svg, int(pixel_width), brick_type, int(block_width), int(block_height)))
+        sys.exit(0)
+
+    args = []
+    widths = DEFAULT_WIDTHS
+    brick_types = BRICK_TYPES
+    repeat = 3
+    output = DEFAULT_OUTPUT
+    rss = True
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        if arg in ('--widths', '--types', '--repeat', '--output') and i + 1 < len(sys.argv):
+            value = sys.argv[i + 1]
+            if arg == '--widths':
+                widths = parse_list(value, int)
+            elif arg == '--types':
+                brick_types = parse_list(value)
+            elif arg == '--repeat':
+                repeat = int(value)
+            else:
+                output = value
+            i += 1
+        elif arg == '--no-rss':
+            rss = False
+        elif arg.startswith('--'):
+            print("Usage: python brick_benchmark.py [input.svg ...] [--widths 20,30,100,400,1000]")
+            print("                                 [--types auto,optimal,1x1,2x2] [--repeat N] [--output FILE] [--no-rss]")
+            print("       python brick_benchmark.py compare <base.json> <new.json>")
+            print("  input.svg: Logos to benchmark (default: outlined square and simple logos)")
+            print("  --widths: Pixel widths to sweep")
+            print("  --types: Brick types to sweep")
+            print("  --repeat N: Timed runs per stage, the best one is kept (default: 3)")
+            print(f"  --output FILE: Results file (default: {DEFAULT_OUTPUT})")
+            print("  --no-rss: Skip the peak RSS runs (one fresh interpreter per case)")
+            sys.exit(1)
+        else:
+            args.append(arg)
+        i += 1
+
+    inputs = args or sorted(path for pattern in DEFAULT_INPUTS for path in glob.glob(pattern))
+    if not inputs:
+        print("No input logos found - run 'make outlined' first")
+        sys.exit(1)
+
+    report = run_benchmarks(inputs, widths, brick_types, repeat, rss)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(report['results'])} result(s) to {output}")
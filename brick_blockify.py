@@ -4,9 +4,50 @@ Post-process SVG logos to make them blocky/pixelated like stacked bricks.
 """
 
 import sys
+import os
+import bisect
+import numpy as np
 from PIL import Image, ImageDraw
 import cairosvg
+from cairosvg.parser import Tree
+from cairosvg.surface import PNGSurface
+import contextlib
+import gzip
+import hashlib
 import io
+import time
+import xml.etree.ElementTree as ET
+
+import brick_cache
+import brick_layout
+import brick_palette
+import brick_profile
+
+
+# Stud geometry (output pixels): 7px wide studs centered in 12px grid cells
+STUD_WIDTH = 7
+STUD_GRID = 12
+STUD_COUNTS = {"1x1": 1, "2x2": 2, "3x3": 3, "4x4": 4}
+
+# Shared hairline styling of compact output: brick edges (be) and stud outlines (se)
+COMPACT_STYLE = ('  <style>.be{stroke:#000;stroke-width:.5;opacity:.3}'
+                 '.se{fill:none;stroke:#000;stroke-width:.5;opacity:.2}</style>')
+
+# Build-up animation: each row group stays hidden until its animation-delay
+ANIMATION_STYLE = '  <style>.row{animation:brick-row 0s both}@keyframes brick-row{from{opacity:0}}</style>'
+
+# Output rows per band in tiled rasterization (the rendered band is 4× as tall)
+DEFAULT_TILE_ROWS = 64
+
+# Rendered PNGs with at most this many distinct RGBA colors are written palette-indexed
+MAX_PALETTE_COLORS = 256
+
+# Lossless WebP effort (Pillow's method, 0-6) when none is given
+DEFAULT_WEBP_EFFORT = 4
+
+# Images with more colors than this are not matched against colour variants
+# (the color similarity table grows with the square of the palette)
+MAX_SIGNATURE_COLORS = 256
 
 
 def svg_to_image(svg_path, width=200):
@@ -14,29 +55,212 @@ def svg_to_image(svg_path, width=200):
     with open(svg_path, 'rb') as f:
         svg_data = f.read()
     
-    # Convert SVG to PNG at higher resolution first
-    png_data = cairosvg.svg2png(bytestring=svg_data, output_width=width * 4)
-    img = Image.open(io.BytesIO(png_data))
+    return svg_data_to_image(svg_data, width)
+
+
+@contextlib.contextmanager
+def svg_surface_pixels(svg_data, output_width, output_height=None):
+    """Render SVG bytes into a cairo image surface and expose its pixel buffer.
     
-    # Downscale using nearest neighbor (no anti-aliasing)
-    img = img.resize((width, int(width * img.height / img.width)), Image.NEAREST)
+    cairosvg draws into an in-memory ARGB32 surface, which is viewed directly
+    as a NumPy array - no PNG is encoded and decoded in between. The view is
+    only valid inside the with block (the surface is freed afterwards), so
+    copy out what you need, e.g. with surface_to_rgba.
     
-    return img
+    Yields:
+        (height, width, 4) uint8 array in cairo's native premultiplied ARGB32 layout
+    """
+    with brick_profile.stage('rasterize.cairosvg'):
+        surface = PNGSurface(Tree(bytestring=svg_data), None, 96,
+                             output_width=output_width, output_height=output_height)
+        image = surface.cairo
+        image.flush()
+    
+    try:
+        pixels = np.frombuffer(image.get_data(), dtype=np.uint8)
+        pixels = pixels.reshape(image.get_height(), image.get_stride() // 4, 4)
+        yield pixels[:, :image.get_width()]
+    finally:
+        surface.finish()
+
+
+def surface_to_rgba(pixels):
+    """Convert cairo premultiplied ARGB32 pixels to straight-alpha RGBA.
+    
+    Rounds like cairo's own PNG writer, so the result matches what decoding
+    svg2png output would give.
+    """
+    if sys.byteorder == 'little':
+        blue, green, red, alpha = (pixels[..., i].astype(np.uint32) for i in range(4))
+    else:
+        alpha, red, green, blue = (pixels[..., i].astype(np.uint32) for i in range(4))
+    
+    rgba = np.empty(pixels.shape, dtype=np.uint8)
+    safe_alpha = np.maximum(alpha, 1)
+    for i, channel in enumerate((red, green, blue)):
+        rgba[..., i] = np.where(alpha > 0, (channel * 255 + safe_alpha // 2) // safe_alpha, 0)
+    rgba[..., 3] = alpha
+    return rgba
+
 
+def nearest_indices(output_size, source_size):
+    """Source pixel index for every output pixel, as Image.NEAREST picks it (pixel centres)."""
+    return ((np.arange(output_size) + 0.5) * source_size / output_size).astype(np.intp)
+
+
+def svg_data_to_image(svg_data, width=200):
+    """Convert in-memory SVG bytes to PIL Image without anti-aliasing."""
+    # Render SVG at higher resolution first, straight into a cairo surface
+    with svg_surface_pixels(svg_data, width * 4) as pixels:
+        # Downscale using nearest neighbor (no anti-aliasing): only the sampled
+        # pixels are copied out of the surface and un-premultiplied
+        with brick_profile.stage('rasterize.downscale'):
+            source_height, source_width = pixels.shape[:2]
+            rows = nearest_indices(int(width * source_height / source_width), source_height)
+            columns = nearest_indices(width, source_width)
+            rgba = surface_to_rgba(pixels[rows][:, columns])
+    
+    return Image.fromarray(rgba, 'RGBA')
+
+
+def svg_length(value):
+    """Parse a unitless or px SVG length attribute (None if missing or in other units)."""
+    if value is None:
+        return None
+    value = value.strip()
+    if value.endswith('px'):
+        value = value[:-2]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def svg_raster_geometry(root, width):
+    """Sizes svg_data_to_image uses for an SVG document, without rendering it.
+    
+    Returns:
+        (viewbox, source_width, source_height, height) - the (x, y, w, h)
+        viewBox, the size cairosvg renders at (4× width) and the height of
+        the downscaled image
+    """
+    doc_width = svg_length(root.get('width'))
+    doc_height = svg_length(root.get('height'))
+    viewbox = root.get('viewBox')
+    if viewbox:
+        viewbox = tuple(float(value) for value in viewbox.replace(',', ' ').split())
+    else:
+        viewbox = (0.0, 0.0, doc_width, doc_height)
+    if doc_width is None or doc_height is None:
+        doc_width, doc_height = viewbox[2], viewbox[3]
+    
+    source_width = width * 4
+    source_height = int(round(doc_height * source_width / doc_width))
+    height = int(width * source_height / source_width)
+    return viewbox, source_width, source_height, height
+
+
+def iter_svg_bands(svg_data, width=200, tile_rows=DEFAULT_TILE_ROWS):
+    """Rasterize SVG bytes in horizontal bands - svg_data_to_image in pieces.
+    
+    Each band of tile_rows output rows is rendered by cairosvg from a slice of
+    the viewBox and downscaled by picking the same nearest-neighbour source
+    pixels as Image.NEAREST on the whole image, so only one band's 4×
+    bitmap exists at a time.
+    
+    Yields:
+        (y, band) - first output row of the band and the band as RGBA PIL Image
+    """
+    ET.register_namespace('', 'http://www.w3.org/2000/svg')
+    root = ET.fromstring(svg_data)
+    viewbox, source_width, source_height, height = svg_raster_geometry(root, width)
+    root.set('preserveAspectRatio', 'none')
+    
+    # Place of the whole-image pixel grid in viewBox units, so every band
+    # lines up exactly with the rows a single render would produce
+    scale, offset_x, offset_y = viewbox_fit(viewbox, source_width, source_height)
+    grid_x = viewbox[0] - offset_x / scale
+    grid_y = viewbox[1] - offset_y / scale
+    
+    # Source column/row sampled for every output pixel
+    columns = nearest_indices(width, source_width)
+    rows = nearest_indices(height, source_height)
+    
+    for y in range(0, height, tile_rows):
+        band_rows = rows[y:y + tile_rows]
+        top = int(band_rows[0])
+        source_rows = int(band_rows[-1]) + 1 - top
+        
+        root.set('viewBox', f'{grid_x} {grid_y + top / scale} {source_width / scale} {source_rows / scale}')
+        root.set('width', str(source_width))
+        root.set('height', str(source_rows))
+        with svg_surface_pixels(ET.tostring(root), source_width, source_rows) as pixels:
+            with brick_profile.stage('rasterize.downscale'):
+                band = surface_to_rgba(pixels[band_rows - top][:, columns])
+        yield y, Image.fromarray(band, 'RGBA')
+
+
+def svg_data_to_image_tiled(svg_data, width=200, tile_rows=DEFAULT_TILE_ROWS):
+    """svg_data_to_image rendered band by band (bounded memory for huge widths)."""
+    bands = [np.asarray(band) for _, band in iter_svg_bands(svg_data, width, tile_rows)]
+    return Image.fromarray(np.concatenate(bands), 'RGBA')
+
+
+def export_raster(svg_path, png_path, webp_path, width, webp_effort=None):
+    """Render an SVG once and save it as PNG and WebP at the given width (see save_raster)."""
+    with brick_profile.stage('raster.cairosvg'):
+        png_data = cairosvg.svg2png(url=svg_path, output_width=width)
+    
+    img = Image.open(io.BytesIO(png_data))
+    img.load()
+    save_raster(img, png_path, webp_path, webp_effort)
 
-def create_brick_side_view(x, y, brick_width, brick_height, color, opacity=1.0, show_studs=True, brick_type="2x2"):
+
+def svg_number(value, precision):
+    """Format a coordinate with at most precision decimals and no trailing zeros."""
+    text = f'{value:.{precision}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def svg_color(color, compact=False):
+    """Fill value for an (r, g, b) color: rgb(r,g,b), or #rrggbb in compact output."""
+    r, g, b = color
+    if compact:
+        return f'#{r:02x}{g:02x}{b:02x}'
+    return f'rgb({r},{g},{b})'
+
+
+def create_brick_side_view(x, y, brick_width, brick_height, color, opacity=1.0, show_studs=True, brick_type="2x2",
+                           hidden_studs=(), top_border=True, compact=False, precision=None):
     """Create SVG elements for a brick from side view with studs on top.
     
     Real brick proportions: 0.6" × 0.6" × 0.5" (width × depth × height)
     Height is 5/6 of width. Studs on top are part of the height.
     
     brick_type: "1x1", "2x2", "3x3", or "4x4" - determines number of studs (1, 2, 3, or 4)
+    color: (r, g, b), or None to leave the fill off so it is inherited
+           (used for the shared brick symbols in --symbols mode)
+    hidden_studs: Indices of studs whose fill is covered by the brick above (the
+                  fill rect is not emitted; the outline still is)
+    top_border: False when the top border is covered by the brick above
+    compact: Style the hairlines through the classes of COMPACT_STYLE and write
+             hex colors instead of repeating the stroke attributes on every element
+    precision: Round coordinates to this many decimals (None = exact)
     """
-    r, g, b = color
-    
     # Use ONLY original color - absolutely NO opacity variations (no shading!)
-    base_color = f"rgb({r},{g},{b})"
+    if color is not None:
+        fill = f' fill="{svg_color(color, compact)}"'
+    else:
+        fill = ''
     border_color = "rgb(0,0,0)"  # Hairline black border
+    if compact:
+        edge = ' class="be"'
+        stud_edge = ' class="se"'
+    else:
+        edge = f' stroke="{border_color}" stroke-width="0.5" opacity="0.3"'
+        stud_edge = f' fill="none" stroke="{border_color}" stroke-width="0.5" opacity="0.2"'
     
     elements = []
     
@@ -46,131 +270,511 @@ def create_brick_side_view(x, y, brick_width, brick_height, color, opacity=1.0,
     stud_height = max(2, int(brick_height * 0.15))  # ~15% for studs
     body_height = brick_height - stud_height  # Body is the rest
     body_y = y + stud_height
-    
-    # Main brick body - ONLY base color, NO opacity variations!
-    elements.append(f'  <rect x="{x}" y="{body_y}" width="{brick_width}" height="{body_height}" fill="{base_color}"/>')
-    
-    # Hairline borders (0.5px)
-    # Top border
-    elements.append(f'  <line x1="{x}" y1="{body_y}" x2="{x + brick_width}" y2="{body_y}" stroke="{border_color}" stroke-width="0.5" opacity="0.3"/>')
-    # Bottom border
-    elements.append(f'  <line x1="{x}" y1="{y + brick_height}" x2="{x + brick_width}" y2="{y + brick_height}" stroke="{border_color}" stroke-width="0.5" opacity="0.3"/>')
-    # Left border
-    elements.append(f'  <line x1="{x}" y1="{body_y}" x2="{x}" y2="{y + brick_height}" stroke="{border_color}" stroke-width="0.5" opacity="0.3"/>')
-    # Right border
-    elements.append(f'  <line x1="{x + brick_width}" y1="{body_y}" x2="{x + brick_width}" y2="{y + brick_height}" stroke="{border_color}" stroke-width="0.5" opacity="0.3"/>')
+    bottom_y = y + brick_height
+    right_x = x + brick_width
     
     # Studs on top - layout depends on brick type
     # Number of studs matches brick width: 1x1=1, 2x2=2, 3x3=3, 4x4=4
     # Studs are aligned on a 12px grid (1x brick width) for consistency
-    stud_count = {"1x1": 1, "2x2": 2, "3x3": 3, "4x4": 4}.get(brick_type, 2)
+    stud_count = STUD_COUNTS.get(brick_type, 2)
     
     # 7px wide studs centered in 12px grid cells
     # Use the allocated stud_height (already calculated as 15% of brick_height)
-    stud_width = 7
+    stud_width = STUD_WIDTH
     
     # Position studs on 12px grid (aligned with 1x brick centers)
-    # Each stud is centered in its 12px cell
-    base_unit = 12  # Grid size (1x brick width)
+    # Each stud is centered in its 12px cell (12-7)/2 = 2.5px offset
+    base_unit = STUD_GRID  # Grid size (1x brick width)
+    stud_xs = [x + base_unit * i + (base_unit - stud_width) / 2 for i in range(stud_count)]
+    
+    if precision is not None:
+        x, y, body_y, bottom_y, right_x, brick_width, body_height, stud_width, stud_height = (
+            svg_number(value, precision)
+            for value in (x, y, body_y, bottom_y, right_x, brick_width, body_height, stud_width, stud_height))
+        stud_xs = [svg_number(stud_x, precision) for stud_x in stud_xs]
+    
+    # Main brick body - ONLY base color, NO opacity variations!
+    elements.append(f'  <rect x="{x}" y="{body_y}" width="{brick_width}" height="{body_height}"{fill}/>')
+    
+    # Hairline borders (0.5px)
+    # Top border
+    if top_border:
+        elements.append(f'  <line x1="{x}" y1="{body_y}" x2="{right_x}" y2="{body_y}"{edge}/>')
+    # Bottom border
+    elements.append(f'  <line x1="{x}" y1="{bottom_y}" x2="{right_x}" y2="{bottom_y}"{edge}/>')
+    # Left border
+    elements.append(f'  <line x1="{x}" y1="{body_y}" x2="{x}" y2="{bottom_y}"{edge}/>')
+    # Right border
+    elements.append(f'  <line x1="{right_x}" y1="{body_y}" x2="{right_x}" y2="{bottom_y}"{edge}/>')
     
-    for i in range(stud_count):
-        # Center stud in its 12px grid cell (12-7)/2 = 2.5px offset
-        stud_x = x + base_unit * i + (base_unit - stud_width) / 2
+    for i, stud_x in enumerate(stud_xs):
         stud_y = y
         
         # Stud body - ONLY base color, NO opacity, SHARP corners (no rx)
         # Use stud_height (not override) to stay within allocated space
-        elements.append(f'  <rect x="{stud_x}" y="{stud_y}" width="{stud_width}" height="{stud_height}" fill="{base_color}"/>')
+        if i not in hidden_studs:
+            elements.append(f'  <rect x="{stud_x}" y="{stud_y}" width="{stud_width}" height="{stud_height}"{fill}/>')
         
         # Hairline border around stud - SHARP corners (no rx)
-        elements.append(f'  <rect x="{stud_x}" y="{stud_y}" width="{stud_width}" height="{stud_height}" fill="none" stroke="{border_color}" stroke-width="0.5" opacity="0.2"/>')
+        elements.append(f'  <rect x="{stud_x}" y="{stud_y}" width="{stud_width}" height="{stud_height}"{stud_edge}/>')
     
     
     return elements
 
 
+def brick_type_for_width(brick_w, block_width=24):
+    """Map a brick width in output pixels to its type ("1x1" ... "4x4")."""
+    # brick_w can be: 12 (1x), 24 (2x), 36 (3x), or 48 (4x)
+    if brick_w == block_width // 2:
+        return "1x1"
+    elif brick_w == block_width:
+        return "2x2"
+    elif brick_w == block_width * 3 // 2:
+        return "3x3"
+    elif brick_w == block_width * 2:
+        return "4x4"
+    else:
+        return "2x2"  # Default fallback
+
+
+def brick_symbol_id(brick_w, block_width=24, hidden_studs=(), top_border=True):
+    """Id of the shared <defs> entry for bricks of the given width and culling."""
+    btype = brick_type_for_width(brick_w, block_width)
+    if brick_w == int(btype[0]) * (block_width // 2):
+        symbol_id = f"brick-{btype}"
+    else:
+        # Widths that only map to a type through the fallback get their own symbol
+        symbol_id = f"brick-{btype}-{brick_w}"
+    if hidden_studs:
+        symbol_id += "-h" + "".join(str(i) for i in hidden_studs)
+    if not top_border:
+        symbol_id += "-nt"
+    return symbol_id
+
+
+def create_brick_symbol(brick_width, brick_height, block_width=24, hidden_studs=(), top_border=True, compact=False,
+                        precision=None):
+    """Create a <defs> entry drawing one brick type at the origin.
+    
+    Fill is left unset on the body and studs so every <use> can give the
+    brick its own color.
+    """
+    symbol_id = brick_symbol_id(brick_width, block_width, hidden_studs, top_border)
+    elements = [f'    <g id="{symbol_id}">']
+    for element in create_brick_side_view(
+        0, 0, brick_width, brick_height, None,
+        brick_type=brick_type_for_width(brick_width, block_width),
+        hidden_studs=hidden_studs,
+        top_border=top_border,
+        compact=compact,
+        precision=precision
+    ):
+        elements.append('    ' + element)
+    elements.append('    </g>')
+    return elements
+
+
+def create_brick_use(x, y, brick_width, color, block_width=24, hidden_studs=(), top_border=True, compact=False,
+                     precision=None):
+    """Create a <use> element placing a shared brick symbol."""
+    symbol_id = brick_symbol_id(brick_width, block_width, hidden_studs, top_border)
+    if precision is not None:
+        x, y = svg_number(x, precision), svg_number(y, precision)
+    return f'  <use xlink:href="#{symbol_id}" x="{x}" y="{y}" fill="{svg_color(color, compact)}"/>'
+
+
+def row_body_spans(row_sizes, block_width=24):
+    """Merged x-spans (output pixels) covered by the brick bodies of one row.
+    
+    Returns (starts, ends) lists sorted by x, ready for span_covered.
+    """
+    unit = block_width // 2
+    starts = []
+    ends = []
+    for x in np.flatnonzero(row_sizes).tolist():
+        start = x * unit
+        end = start + int(row_sizes[x])
+        if ends and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def span_covered(spans, start, end):
+    """Check if [start, end] lies inside one of the merged spans."""
+    starts, ends = spans
+    i = bisect.bisect_right(starts, start) - 1
+    return i >= 0 and ends[i] >= end
+
+
+def brick_occlusion(brick_x, brick_w, brick_type, spans_above, cull_studs=True, cull_seam=False):
+    """Work out which parts of a brick the opaque bodies of the row above paint over.
+    
+    Only elements lying entirely under an upper brick body are hidden, so
+    culling does not change the image rendered at the SVG's own size (or a
+    whole multiple of it, where every edge falls on a pixel boundary).
+    cull_studs and cull_seam tell whether the upper bodies reach far enough
+    down (see iter_brick_placements):
+    
+    - stud fills are hidden when an upper body spans the stud's width
+    - the top border (a 0.5px stroke) is hidden when upper bodies span the
+      brick's width and reach 0.25px below the seam
+    
+    Stud outlines are always drawn: their bottom edge is a stroke on the
+    seam, like the top border.
+    
+    Returns:
+        (hidden_studs, top_border) as accepted by create_brick_side_view
+    """
+    hidden_studs = ()
+    if cull_studs:
+        hidden_studs = tuple(
+            i for i in range(STUD_COUNTS.get(brick_type, 2))
+            if span_covered(spans_above,
+                            brick_x + STUD_GRID * i + (STUD_GRID - STUD_WIDTH) / 2,
+                            brick_x + STUD_GRID * i + (STUD_GRID + STUD_WIDTH) / 2)
+        )
+    top_border = not (cull_seam and span_covered(spans_above, brick_x, brick_x + brick_w))
+    return hidden_studs, top_border
+
+
+def iter_brick_placements(brick_sizes, rgb, block_width=24, block_height=20, vertical_offset=0, cull=False):
+    """Yield every brick in drawing order (bottom row first).
+    
+    Yields:
+        (brick_x, brick_y, brick_w, (r, g, b), hidden_studs, top_border)
+    """
+    height = brick_sizes.shape[0]
+    
+    stud_height = max(2, int(block_height * 0.15))
+    body_height = block_height - stud_height
+    inner_stud_height = max(2, int(body_height * 0.15))
+    inner_body_height = body_height - inner_stud_height
+    
+    # Relative to a brick's top, the upper row's body spans
+    # [inner_stud_height - inner_body_height, body_height - inner_body_height].
+    # It ends exactly on the top border (y = inner_stud_height), so the lower
+    # half of that stroke stays visible: stud fills ([0, inner_stud_height])
+    # can be covered, the top border and stud outlines cannot.
+    upper_top = inner_stud_height - inner_body_height
+    upper_bottom = body_height - inner_body_height
+    cull_studs = upper_top <= 0 and upper_bottom >= inner_stud_height
+    cull_seam = upper_top <= inner_stud_height - 0.25 and upper_bottom >= inner_stud_height + 0.25
+    
+    # Process each pixel as a brick - DRAW FROM BOTTOM TO TOP (reverse y order)
+    # This way upper bricks are drawn after (on top of) lower bricks, hiding studs below
+    for y in range(height - 1, -1, -1):  # Start from bottom (highest y) to top (y=0)
+        row_sizes = brick_sizes[y]
+        spans_above = row_body_spans(brick_sizes[y - 1], block_width) if cull and y > 0 else None
+        for x in np.flatnonzero(row_sizes).tolist():
+            brick_w = int(row_sizes[x])
+            color = tuple(rgb[y, x].tolist())
+            
+            # Calculate brick position based on pixel coordinates to preserve shape
+            brick_x = x * (block_width // 2)  # Each pixel x-position is half-width unit
+            
+            # Y position: space bricks by inner_body_height so upper brick bodies
+            # sit on top of lower brick studs, hiding them naturally
+            # Add vertical_offset to center content in square outputs
+            brick_y = y * inner_body_height + vertical_offset
+            
+            if spans_above is not None:
+                btype = brick_type_for_width(brick_w, block_width)
+                hidden_studs, top_border = brick_occlusion(brick_x, brick_w, btype, spans_above, cull_studs,
+                                                           cull_seam)
+            else:
+                hidden_studs, top_border = (), True
+            
+            yield brick_x, brick_y, brick_w, color, hidden_studs, top_border
+
+
 def colors_similar(color1, color2, tolerance=2):
     """Check if two RGB colors are similar within tolerance."""
     return all(abs(c1 - c2) <= tolerance for c1, c2 in zip(color1, color2))
 
 
-def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, brick_type="auto"):
-    """Convert PIL Image to brick-style blocky SVG with adaptive brick sizing.
+def image_to_arrays(img, min_alpha=128):
+    """Split a PIL Image into an opacity mask and an RGB plane.
     
-    Args:
-        block_width: Width for 2x2 bricks (1x1=12px, 2x2=24px, 3x3=36px, 4x4=48px)
-        block_height: Height for all bricks (5/6 of block_width for proper ratio)
-        brick_type: "auto" (adaptive 1x1/2x2/3x3/4x4), "1x1", "2x2", "3x3", or "4x4"
+    Returns:
+        opaque: (height, width) bool array, True where alpha >= min_alpha
+        rgb: (height, width, 3) uint8 array with the pixel colors
     """
-    width, height = img.size
-    
     # Convert to RGBA if not already
     if img.mode != 'RGBA':
         img = img.convert('RGBA')
     
-    # Get pixel data
-    pixels = img.load()
+    rgba = np.asarray(img)
+    opaque = rgba[:, :, 3] >= min_alpha
+    rgb = rgba[:, :, :3]
+    return opaque, rgb
+
+
+def color_keys(opaque, rgb):
+    """Pack RGB colors into one integer per pixel (-1 for transparent pixels).
+    
+    Two pixels belong to the same color run exactly when their keys are equal,
+    so the packer can compare plain ints instead of color tuples.
+    """
+    keys = (rgb[:, :, 0].astype(np.int32) << 16) | (rgb[:, :, 1].astype(np.int32) << 8) | rgb[:, :, 2]
+    keys[~opaque] = -1
+    return keys
+
+
+def color_run_lengths(keys):
+    """Index of same-color run lengths for every pixel.
+    
+    One right-to-left sweep over the columns (all rows at once) gives, for
+    each pixel, how many consecutive pixels starting there share its color.
+    Transparent pixels get 0.
+    """
+    height, width = keys.shape
+    runs = np.zeros((height, width), dtype=np.int32)
+    if width == 0:
+        return runs
+    runs[:, width - 1] = keys[:, width - 1] >= 0
+    for x in range(width - 2, -1, -1):
+        same = keys[:, x] == keys[:, x + 1]
+        runs[:, x] = np.where(keys[:, x] >= 0, np.where(same, runs[:, x + 1] + 1, 1), 0)
+    return runs
+
+
+def layout_signature(opaque, rgb):
+    """Color-independent digest of everything compute_brick_grid looks at.
+    
+    The packer only compares colors for equality and with colors_similar, so
+    two images get the same brick layout when their opacity masks match and
+    their colors map one-to-one onto each other with the same similarity
+    relation - e.g. the black, white and multicolor variants of a logo.
+    Colors are numbered in order of first appearance, so such colour variants
+    have equal signatures.
+    
+    Returns:
+        Hex digest, or None if the image has more than MAX_SIGNATURE_COLORS colors
+    """
+    keys = color_keys(opaque, rgb).ravel()
+    values, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    if len(values) > MAX_SIGNATURE_COLORS:
+        return None
+    
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(values), dtype=np.int32)
+    rank[order] = np.arange(len(values), dtype=np.int32)
+    palette = values[order]
+    palette = palette[palette >= 0]
+    channels = np.stack([palette >> 16, (palette >> 8) & 0xff, palette & 0xff], axis=1)
+    # colors_similar with its default tolerance, for every pair of palette colors
+    similar = np.abs(channels[:, None, :] - channels[None, :, :]).max(axis=2) <= 2
+    
+    digest = hashlib.sha256()
+    digest.update(np.asarray(opaque.shape, dtype=np.int64).tobytes())
+    digest.update(np.packbits(opaque).tobytes())
+    digest.update(rank[inverse.ravel()].tobytes())
+    digest.update(np.packbits(similar).tobytes())
+    return digest.hexdigest()
+
+
+def variant_brick_grid(opaque, rgb, block_width=24, brick_type="auto", variant_layouts=None):
+    """compute_brick_grid, reusing the layout of an already packed colour variant.
+    
+    Args:
+        variant_layouts: Dict shared between calls, maps (layout_signature,
+            block_width, brick_type) -> brick grid (None = always pack)
+    """
+    signature = layout_signature(opaque, rgb) if variant_layouts is not None else None
+    if signature is None:
+        return compute_brick_grid(opaque, rgb, block_width, brick_type)
+    
+    key = (signature, block_width, brick_type)
+    brick_sizes = variant_layouts.get(key)
+    if brick_sizes is not None:
+        print("  Reusing the brick layout of a colour variant")
+        brick_profile.count('layout.variant_reuse')
+        return brick_sizes
+    brick_sizes = compute_brick_grid(opaque, rgb, block_width, brick_type)
+    variant_layouts[key] = brick_sizes
+    return brick_sizes
+
+
+def split_run_optimal(run_length, below, first_excluded=None):
+    """Split one same-color run into the fewest bricks (1-4 pixels long).
+    
+    Dynamic programming from the right end of the run: fewest[i] is the
+    smallest number of bricks covering offsets i onwards. With four brick
+    lengths this is linear in the run length. Ties are broken towards the
+    longest brick at each position, like the greedy packer.
+    
+    Args:
+        run_length: Number of pixels in the run
+        below: Per offset, the length of the same-color brick starting directly
+            below it (0 = none). While more than 2 pixels of the run remain, a
+            brick never repeats that length, so bricks stay staggered.
+        first_excluded: Length the run's first brick avoids if that needs no
+            extra brick (used to vary a row's first brick from the previous row's)
+    
+    Returns:
+        Brick lengths from left to right
+    """
+    if run_length <= 2:
+        # One brick, and no stagger rule applies this close to the run's end
+        return [run_length]
+    
+    # fewest[i] = fewest bricks covering offsets i onwards (the last two offsets need one)
+    fewest = [0] * (run_length + 1)
+    fewest[run_length - 1] = fewest[run_length - 2] = 1
+    for i in range(run_length - 3, -1, -1):
+        forbidden = below[i]
+        best = run_length
+        for length in (4, 3, 2, 1):
+            if length != forbidden and i + length <= run_length and fewest[i + length] < best:
+                best = fewest[i + length]
+        fewest[i] = best + 1
+    
+    lengths = []
+    i = 0
+    while i < run_length:
+        remaining = run_length - i
+        if remaining <= 2:
+            lengths.append(remaining)
+            break
+        # Fewest bricks first, then the longest brick
+        candidates = [length for length in (4, 3, 2, 1)
+                      if length != below[i] and length <= remaining and fewest[i + length] == fewest[i] - 1]
+        if i == 0 and first_excluded is not None:
+            # Vary the first brick only where that costs no extra brick
+            candidates = [length for length in candidates if length != first_excluded] or candidates
+        lengths.append(candidates[0])
+        i += candidates[0]
+    return lengths
+
+
+def compute_brick_grid_optimal(opaque, rgb, block_width=24, state=None):
+    """compute_brick_grid for brick_type "optimal": fewest bricks per same-color run.
+    
+    Every run is split with split_run_optimal, keeping the greedy packer's
+    stagger rules: no brick repeats the width of the same-color brick
+    directly below while more than 2 pixels of its run remain, and a row's
+    first brick differs from the previous row's first brick where that costs
+    no extra brick.
+    state works as for compute_brick_grid.
+    """
+    optimal_start = time.perf_counter()
+    height, width = opaque.shape
+    brick_sizes = np.zeros((height, width), dtype=np.int32)
+    runs = color_run_lengths(color_keys(opaque, rgb))
+    prev_row_first_brick = None  # First brick length of the previous non-empty row
+    prev_row_bricks = {}  # Bricks of the previous row: x_pos -> (length, color)
+    if state:
+        prev_row_first_brick = state['prev_row_first_brick']
+        prev_row_bricks = state['prev_row_bricks']
     
-    # First pass: identify which pixels are opaque and their colors
-    opaque_map = {}
-    color_map = {}
     for y in range(height):
-        for x in range(width):
-            r, g, b, a = pixels[x, y]
-            opaque_map[(x, y)] = (a >= min_alpha)
-            if a >= min_alpha:
-                color_map[(x, y)] = (r, g, b, a)
+        row_runs = runs[y].tolist()
+        row_rgb = rgb[y].tolist()
+        row_sizes = [0] * width
+        row_first_brick = None
+        current_row_bricks = {}
+        x = 0
+        while x < width:
+            run_length = row_runs[x]
+            if run_length == 0:
+                x += 1
+                continue
+            
+            color = tuple(row_rgb[x])
+            below = [0] * run_length
+            if run_length > 2:
+                for i in range(run_length):
+                    brick_below = prev_row_bricks.get(x + i)
+                    if brick_below is not None and brick_below[1] == color:
+                        below[i] = brick_below[0]
+            
+            first_excluded = prev_row_first_brick if row_first_brick is None else None
+            for length in split_run_optimal(run_length, below, first_excluded):
+                if row_first_brick is None:
+                    row_first_brick = length
+                current_row_bricks[x] = (length, color)
+                row_sizes[x] = length * (block_width // 2)
+                x += length
+        
+        brick_sizes[y] = row_sizes
+        if row_first_brick is not None:
+            prev_row_first_brick = row_first_brick
+        prev_row_bricks = current_row_bricks
+    
+    if state is not None:
+        state['prev_row_first_brick'] = prev_row_first_brick
+        state['prev_row_bricks'] = prev_row_bricks
+    
+    brick_profile.add_time('pack.optimal', time.perf_counter() - optimal_start)
+    return brick_sizes
+
+
+def compute_brick_grid(opaque, rgb, block_width=24, brick_type="auto", state=None):
+    """Decide brick placement for every row of the image.
+    
+    Returns a (height, width) int32 array where each brick's leftmost pixel
+    holds the brick width in output pixels (12, 24, 36 or 48 for the default
+    block_width) and every other cell is 0.
+    
+    brick_type "auto" packs greedily and patches each row with a few
+    rewrites, "optimal" uses the fewest bricks per same-color run (see
+    compute_brick_grid_optimal), "1x1" and "2x2" use fixed sizes.
+    
+    An image can also be packed in horizontal bands, top to bottom: pass the
+    same (initially empty) state dict with every band and the result is the
+    same as packing the whole image at once.
+    """
+    if brick_type == "optimal":
+        return compute_brick_grid_optimal(opaque, rgb, block_width, state)
+    
+    height, width = opaque.shape
+    brick_sizes = np.zeros((height, width), dtype=np.int32)
     
     # Determine brick sizes adaptively if auto mode
-    brick_sizes = {}  # (x, y) -> brick_width (12, 24, 36, or 48)
     if brick_type == "auto":
+        greedy_start = time.perf_counter()
+        keys = color_keys(opaque, rgb)
+        runs = color_run_lengths(keys)
         prev_row_first_brick = None  # Track first brick size of previous row
         prev_row_bricks = {}  # Track all bricks in previous row: x_pos -> (length, color)
+        if state:
+            prev_row_first_brick = state['prev_row_first_brick']
+            prev_row_bricks = state['prev_row_bricks']
+        
+        # Instrumentation: time spent in the row post-processing and rewrites applied
+        rewrite_seconds = 0.0
+        rewrites = {'3+3->2+4': 0, '3+2->4+1': 0, '2+1->3': 0}
         
         for y in range(height):
+            row_runs = runs[y].tolist()
+            row_rgb = rgb[y].tolist()
+            row_sizes = [0] * width
             x = 0
             row_first_brick = None  # Track first brick of this row
             current_row_bricks = {}  # Track bricks in current row: x_pos -> (length, color)
             
             while x < width:
-                if not opaque_map.get((x, y), False):
+                if row_runs[x] == 0:
                     x += 1
                     continue
                 
-                base_color = color_map.get((x, y), (0, 0, 0, 0))[:3]
+                base_color = tuple(row_rgb[x])
                 
-                # Count how many consecutive pixels of same color exist
-                color_run_length = 0
-                for i in range(width - x):
-                    if (opaque_map.get((x + i, y), False) and 
-                        color_map.get((x + i, y), (0, 0, 0, 0))[:3] == base_color):
-                        color_run_length += 1
-                    else:
-                        break
+                # Length of the same-color run starting here, from the precomputed index
+                color_run_length = row_runs[x]
                 
-                # Find all possible brick sizes at this position
-                possible_lengths = []
-                for length in [4, 3, 2, 1]:
-                    if x + length - 1 < width:
-                        # Check if all pixels in range have same color
-                        all_same = all(
-                            opaque_map.get((x + i, y), False) and 
-                            color_map.get((x + i, y), (0, 0, 0, 0))[:3] == base_color
-                            for i in range(length)
-                        )
-                        if all_same:
-                            possible_lengths.append(length)
-                
-                if not possible_lengths:
-                    x += 1
-                    continue
+                # All possible brick sizes at this position, longest first
+                possible_lengths = [length for length in [4, 3, 2, 1] if length <= color_run_length]
                 
                 # Start with longest possible brick
                 max_length = possible_lengths[0]
                 
                 # Check if there's a brick directly below at the same x position
                 # Avoid stacking same-width same-color bricks when color run > 2
-                if y > 0:
+                if prev_row_bricks:
                     brick_below = prev_row_bricks.get(x)
                     if brick_below is not None:
                         brick_below_length, brick_below_color = brick_below
@@ -206,15 +810,16 @@ def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, bric
                 
                 # Place brick of detected size
                 brick_w = max_length * (block_width // 2)
-                brick_sizes[(x, y)] = brick_w
+                row_sizes[x] = brick_w
                 
                 # Mark other pixels as used
                 for i in range(1, max_length):
-                    brick_sizes[(x + i, y)] = 0
+                    row_sizes[x + i] = 0
                 
                 x += max_length
             
             # Post-process the row to replace patterns with better brick combinations
+            rewrite_start = time.perf_counter()
             row_positions = sorted([pos for pos in current_row_bricks.keys()])
             i = 0
             while i < len(row_positions) - 1:
@@ -228,12 +833,12 @@ def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, bric
                     # Replace 3+3 with 2+4 (more stable stacking pattern)
                     if length1 == 3 and length2 == 3:
                         # Replace with 2-width brick + 4-width brick
-                        brick_sizes[(x1, y)] = 2 * (block_width // 2)
-                        brick_sizes[(x1 + 1, y)] = 0
-                        brick_sizes[(x1 + 2, y)] = 4 * (block_width // 2)
-                        brick_sizes[(x1 + 3, y)] = 0
-                        brick_sizes[(x1 + 4, y)] = 0
-                        brick_sizes[(x1 + 5, y)] = 0
+                        row_sizes[x1] = 2 * (block_width // 2)
+                        row_sizes[x1 + 1] = 0
+                        row_sizes[x1 + 2] = 4 * (block_width // 2)
+                        row_sizes[x1 + 3] = 0
+                        row_sizes[x1 + 4] = 0
+                        row_sizes[x1 + 5] = 0
                         
                         # Update current_row_bricks tracking
                         current_row_bricks[x1] = (2, color1)
@@ -242,17 +847,18 @@ def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, bric
                         
                         # Update row_positions list
                         row_positions[i + 1] = x1 + 2
+                        rewrites['3+3->2+4'] += 1
                         i += 1
                         continue
                     
                     # Replace 3+2 with 4+1 (better stacking pattern)
                     elif length1 == 3 and length2 == 2:
                         # Replace with 4-width brick + 1-width brick
-                        brick_sizes[(x1, y)] = 4 * (block_width // 2)
-                        brick_sizes[(x1 + 1, y)] = 0
-                        brick_sizes[(x1 + 2, y)] = 0
-                        brick_sizes[(x1 + 3, y)] = 0
-                        brick_sizes[(x1 + 4, y)] = 1 * (block_width // 2)
+                        row_sizes[x1] = 4 * (block_width // 2)
+                        row_sizes[x1 + 1] = 0
+                        row_sizes[x1 + 2] = 0
+                        row_sizes[x1 + 3] = 0
+                        row_sizes[x1 + 4] = 1 * (block_width // 2)
                         
                         # Update current_row_bricks tracking
                         current_row_bricks[x1] = (4, color1)
@@ -261,15 +867,16 @@ def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, bric
                         
                         # Update row_positions list
                         row_positions[i + 1] = x1 + 4
+                        rewrites['3+2->4+1'] += 1
                         i += 1
                         continue
                     
                     # Replace 2+1 or 1+2 with 3-width brick
                     elif (length1 == 2 and length2 == 1) or (length1 == 1 and length2 == 2):
                         # Replace with a single 3-width brick using the first brick's color
-                        brick_sizes[(x1, y)] = 3 * (block_width // 2)
-                        brick_sizes[(x1 + 1, y)] = 0
-                        brick_sizes[(x1 + 2, y)] = 0
+                        row_sizes[x1] = 3 * (block_width // 2)
+                        row_sizes[x1 + 1] = 0
+                        row_sizes[x1 + 2] = 0
                         
                         # Update current_row_bricks tracking
                         current_row_bricks[x1] = (3, color1)
@@ -277,43 +884,74 @@ def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, bric
                         
                         # Update row_positions list
                         row_positions.pop(i + 1)
+                        rewrites['2+1->3'] += 1
                         continue
                 
                 i += 1
+            rewrite_seconds += time.perf_counter() - rewrite_start
+            
+            brick_sizes[y] = row_sizes
             
             # Update tracking for next iteration
             if row_first_brick is not None:
                 prev_row_first_brick = row_first_brick
             prev_row_bricks = current_row_bricks
+        
+        if state is not None:
+            state['prev_row_first_brick'] = prev_row_first_brick
+            state['prev_row_bricks'] = prev_row_bricks
+        
+        brick_profile.add_time('pack.greedy', time.perf_counter() - greedy_start - rewrite_seconds)
+        brick_profile.add_time('pack.rewrite', rewrite_seconds)
+        for rewrite, n in rewrites.items():
+            brick_profile.count(f'rewrite.{rewrite}', n)
     else:
+        fixed_start = time.perf_counter()
         # Fixed brick size
         if brick_type == "1x1":
             # Simple case: every opaque pixel gets a 1x1 brick
-            for y in range(height):
-                for x in range(width):
-                    if opaque_map.get((x, y), False):
-                        brick_sizes[(x, y)] = block_width // 2
+            brick_sizes[opaque] = block_width // 2
         else:  # brick_type == "2x2"
             # For 2x2 mode: try to place 2x2 bricks, fallback to 1x1
             for y in range(height):
+                row_opaque = opaque[y].tolist()
                 x = 0
                 while x < width:
-                    if not opaque_map.get((x, y), False):
+                    if not row_opaque[x]:
                         x += 1
                         continue
                     
                     # Check if we can place a 2x2 brick (need 2 consecutive opaque pixels)
-                    if x + 1 < width and opaque_map.get((x + 1, y), False):
-                        # Place 2x2 brick
-                        brick_sizes[(x, y)] = block_width
-                        brick_sizes[(x + 1, y)] = 0  # Skip next pixel
+                    if x + 1 < width and row_opaque[x + 1]:
+                        # Place 2x2 brick (next pixel stays 0)
+                        brick_sizes[y, x] = block_width
                         x += 2
                     else:
                         # Not enough space for 2x2, use 1x1 brick
-                        brick_sizes[(x, y)] = block_width // 2
+                        brick_sizes[y, x] = block_width // 2
                         x += 1
+        brick_profile.add_time('pack.fixed', time.perf_counter() - fixed_start)
+    
+    return brick_sizes
+
+
+def brick_type_counts(brick_sizes, block_width=24):
+    """Number of bricks of each type ("1x1" ... "4x4") in a brick grid."""
+    widths, counts = np.unique(brick_sizes[brick_sizes > 0], return_counts=True)
+    type_counts = {}
+    for brick_w, n in zip(widths.tolist(), counts.tolist()):
+        btype = brick_type_for_width(brick_w, block_width)
+        type_counts[btype] = type_counts.get(btype, 0) + n
+    return type_counts
+
+
+def brick_svg_size(width, height, block_width=24, block_height=20):
+    """Output dimensions for a brick image of width × height pixels.
     
-    # Calculate actual SVG dimensions
+    Returns:
+        (svg_width, svg_height, vertical_offset) - vertical_offset centers the
+        content in square outputs
+    """
     # Width should be based on the maximum x-coordinate of any brick
     svg_width = width * (block_width // 2)  # Each pixel position takes half-width
     
@@ -339,97 +977,644 @@ def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, bric
         svg_height = content_height
         vertical_offset = 0
     
-    svg_parts = [
-        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
-        f'<svg width="{svg_width}" height="{svg_height}" viewBox="0 0 {svg_width} {svg_height}" ',
-        '     xmlns="http://www.w3.org/2000/svg">',
-        f'  <desc>Brick-style blocky version - {brick_type} bricks side view</desc>',
-    ]
+    return svg_width, svg_height, vertical_offset
+
+
+def brick_raster_canvas(brick_sizes, output_width, block_width=24, block_height=20, supersample=2):
+    """Empty premultiplied RGBA canvas for a brick layout, supersample times output_width wide.
+    
+    The output height follows the aspect ratio of the brick SVG.
+    """
+    height, width = brick_sizes.shape
+    svg_width, svg_height, _ = brick_svg_size(width, height, block_width, block_height)
+    output_height = max(1, round(svg_height * output_width / svg_width))
+    return np.zeros((output_height * supersample, output_width * supersample, 4), dtype=np.float32)
+
+
+def paint_brick_rows(canvas, brick_sizes, rgb, block_width=24, block_height=20, cull=False):
+    """Paint a brick layout into a canvas from brick_raster_canvas, one row of bricks at a time.
+    
+    Paints the same body rects, hairline borders and studs as
+    create_brick_side_view, in the same bottom-to-top order. Rows without
+    bricks are skipped.
+    
+    Yields:
+        (top, bottom) - the canvas rows painted by each row of bricks, once it is drawn
+    """
+    height, width = brick_sizes.shape
+    svg_width, svg_height, vertical_offset = brick_svg_size(width, height, block_width, block_height)
+    scale_x = canvas.shape[1] / svg_width
+    scale_y = canvas.shape[0] / svg_height
+    
+    # Canvas rows painted by the current row of bricks
+    painted = [canvas.shape[0], 0]
+    
+    def paint(x0, y0, x1, y1, color=None, opacity=1.0):
+        """Composite a rect: opaque color, or black at the given opacity."""
+        px0 = max(0, round(x0 * scale_x))
+        px1 = min(canvas.shape[1], round(x1 * scale_x))
+        py0 = max(0, round(y0 * scale_y))
+        py1 = min(canvas.shape[0], round(y1 * scale_y))
+        if px1 <= px0 or py1 <= py0:
+            return
+        painted[0] = min(painted[0], py0)
+        painted[1] = max(painted[1], py1)
+        region = canvas[py0:py1, px0:px1]
+        if color is not None:
+            region[:] = color
+        else:
+            region *= 1.0 - opacity
+            region[:, :, 3] += opacity
+    
+    def line(x0, y0, x1, y1, opacity):
+        """Hairline (0.5px) horizontal or vertical line with butt caps."""
+        if y0 == y1:
+            paint(x0, y0 - 0.25, x1, y0 + 0.25, opacity=opacity)
+        else:
+            paint(x0 - 0.25, y0, x0 + 0.25, y1, opacity=opacity)
+    
+    # Same geometry as create_brick_side_view with brick_height=body_height
+    stud_height = max(2, int(block_height * 0.15))
+    brick_height = block_height - stud_height
+    inner_stud_height = max(2, int(brick_height * 0.15))
+    
+    row_y = None
+    for brick_x, brick_y, brick_w, color, hidden_studs, top_border in iter_brick_placements(
+            brick_sizes, rgb, block_width, block_height, vertical_offset, cull=cull):
+        if brick_y != row_y:
+            if row_y is not None and painted[1] > painted[0]:
+                yield painted[0], painted[1]
+            row_y = brick_y
+            painted[:] = [canvas.shape[0], 0]
+        
+        fill = (color[0] / 255, color[1] / 255, color[2] / 255, 1.0)
+        body_y = brick_y + inner_stud_height
+        bottom_y = brick_y + brick_height
+        
+        paint(brick_x, body_y, brick_x + brick_w, bottom_y, fill)
+        if top_border:
+            line(brick_x, body_y, brick_x + brick_w, body_y, 0.3)
+        line(brick_x, bottom_y, brick_x + brick_w, bottom_y, 0.3)
+        line(brick_x, body_y, brick_x, bottom_y, 0.3)
+        line(brick_x + brick_w, body_y, brick_x + brick_w, bottom_y, 0.3)
+        
+        for i in range(STUD_COUNTS.get(brick_type_for_width(brick_w, block_width), 2)):
+            stud_x = brick_x + STUD_GRID * i + (STUD_GRID - STUD_WIDTH) / 2
+            stud_right = stud_x + STUD_WIDTH
+            stud_bottom = brick_y + inner_stud_height
+            if i not in hidden_studs:
+                paint(stud_x, brick_y, stud_right, stud_bottom, fill)
+            # Stroke outline as four non-overlapping strips (one element, one opacity)
+            paint(stud_x - 0.25, brick_y - 0.25, stud_right + 0.25, brick_y + 0.25, opacity=0.2)
+            paint(stud_x - 0.25, stud_bottom - 0.25, stud_right + 0.25, stud_bottom + 0.25, opacity=0.2)
+            paint(stud_x - 0.25, brick_y + 0.25, stud_x + 0.25, stud_bottom - 0.25, opacity=0.2)
+            paint(stud_right - 0.25, brick_y + 0.25, stud_right + 0.25, stud_bottom - 0.25, opacity=0.2)
+    
+    if row_y is not None and painted[1] > painted[0]:
+        yield painted[0], painted[1]
+
+
+def canvas_to_rgba(canvas, supersample=2):
+    """Average supersampled canvas rows down to a uint8 RGBA array.
+    
+    canvas may be a band of a canvas, as long as it spans whole output rows
+    (a multiple of supersample canvas rows).
+    """
+    height, width = canvas.shape[0] // supersample, canvas.shape[1] // supersample
+    
+    # Average the supersampled pixels, then un-premultiply
+    canvas = canvas.reshape(height, supersample, width, supersample, 4).mean(axis=(1, 3))
+    alpha = canvas[:, :, 3:4]
+    rgb_out = np.divide(canvas[:, :, :3], alpha, out=np.zeros_like(canvas[:, :, :3]), where=alpha > 0)
+    rgba = np.concatenate([rgb_out, alpha], axis=2)
+    return np.clip(np.rint(rgba * 255), 0, 255).astype(np.uint8)
+
+
+def render_brick_raster(brick_sizes, rgb, output_width, block_width=24, block_height=20, cull=False, supersample=2):
+    """Draw a brick layout straight into an RGBA image, without going through SVG.
+    
+    Paints the bricks (see paint_brick_rows) into a NumPy buffer at
+    output_width pixels wide. Edges are anti-aliased by drawing at
+    `supersample` times the size and averaging down.
+    
+    Returns:
+        PIL Image in RGBA mode
+    """
+    canvas = brick_raster_canvas(brick_sizes, output_width, block_width, block_height, supersample)
+    for _ in paint_brick_rows(canvas, brick_sizes, rgb, block_width, block_height, cull=cull):
+        pass
+    return Image.fromarray(canvas_to_rgba(canvas, supersample), 'RGBA')
+
+
+def palette_image(img, max_colors=MAX_PALETTE_COLORS):
+    """Palette-indexed (P mode) copy of an image with the exact same pixels, or None.
+    
+    Brick renders use a few brick colors plus their blends with the hairlines
+    and the transparent background, so they often fit in a PNG palette.
+    Transparency is kept in the palette's alpha values (tRNS).
+    
+    Returns:
+        P mode image, or None if img has more than max_colors distinct RGBA colors
+    """
+    img = img.convert('RGBA')
+    if img.getcolors(max_colors) is None:
+        return None
+    
+    keys = np.ascontiguousarray(np.asarray(img)).view(np.uint32)[:, :, 0]
+    colors, index = np.unique(keys, return_inverse=True)
+    indexed = Image.fromarray(index.reshape(keys.shape).astype(np.uint8), 'P')
+    indexed.putpalette(colors.view(np.uint8).tobytes(), rawmode='RGBA')
+    return indexed
+
+
+def encode_raster(img, fmt, webp_effort=None):
+    """Encode a rendered image as PNG or WebP bytes.
+    
+    Args:
+        fmt: 'png' - palette-indexed when the colors fit (see palette_image), RGBA otherwise;
+            'webp' - lossy at quality 95, or lossless with webp_effort
+        webp_effort: None for lossy WebP, or 0-6 for lossless WebP at that effort
+            (higher = smaller files, slower encoding)
+    """
+    buffer = io.BytesIO()
+    if fmt == 'png':
+        (palette_image(img) or img).save(buffer, 'PNG')
+    elif webp_effort is None:
+        img.save(buffer, 'WEBP', quality=95)
+    else:
+        img.save(buffer, 'WEBP', lossless=True, quality=100, method=webp_effort)
+    return buffer.getvalue()
+
+
+def report_raster_savings(img, png_data, webp_data, webp_effort=None):
+    """Report bytes saved against RGBA PNG (and lossy WebP) encoding.
+    
+    Only done while profiling, since it encodes the image a second time.
+    """
+    buffer = io.BytesIO()
+    img.convert('RGBA').save(buffer, 'PNG')
+    png_saved = len(buffer.getvalue()) - len(png_data)
+    brick_profile.count('raster.png_bytes_saved', png_saved)
+    message = f"  PNG: {len(png_data)} bytes, {png_saved} saved against RGBA"
+    if webp_effort is not None:
+        webp_saved = len(encode_raster(img, 'webp')) - len(webp_data)
+        brick_profile.count('raster.webp_bytes_saved', webp_saved)
+        message += f"; lossless WebP: {len(webp_data)} bytes, {webp_saved} saved against lossy"
+    print(message)
+
+
+def save_raster(img, png_path, webp_path, webp_effort=None):
+    """Encode one rendered image as both PNG and WebP (see encode_raster)."""
+    with brick_profile.stage('raster.encode'):
+        png_data = encode_raster(img, 'png')
+        webp_data = encode_raster(img, 'webp', webp_effort)
+    for path, data in ((png_path, png_data), (webp_path, webp_data)):
+        with open(path, 'wb') as f:
+            f.write(data)
+        brick_profile.output(path)
+    if brick_profile.enabled():
+        report_raster_savings(img, png_data, webp_data, webp_effort)
+
+
+def iter_brick_svg_elements(img, block_width=24, block_height=20, min_alpha=128, brick_type="auto", symbols=False,
+                            cull=False, stats=None, brick_sizes=None, compact=False, precision=None, row_delay=None):
+    """Yield the SVG element lines for all bricks (plus <defs> in symbol mode
+    and the <style> blocks in compact and animated mode).
+    
+    This is the body of image_to_brick_svg without the <svg> root, so callers
+    can place the bricks inside their own document. Arguments are the same as
+    for image_to_brick_svg; stats is filled once the generator is exhausted.
+    """
+    width, height = img.size
+    
+    # Alpha mask and RGB planes straight from the RGBA pixel buffer
+    opaque, rgb = image_to_arrays(img, min_alpha)
+    
+    # Brick widths per row (0 = no brick starts at this pixel)
+    if brick_sizes is None:
+        brick_sizes = compute_brick_grid(opaque, rgb, block_width, brick_type)
+    
+    _, _, vertical_offset = brick_svg_size(width, height, block_width, block_height)
     
     # Calculate stud and body heights once
     stud_height = max(2, int(block_height * 0.15))
     body_height = block_height - stud_height
     
-    # Process each pixel as a brick - DRAW FROM BOTTOM TO TOP (reverse y order)
-    # This way upper bricks are drawn after (on top of) lower bricks, hiding studs below
-    for y in range(height - 1, -1, -1):  # Start from bottom (highest y) to top (y=0)
-        for x in range(width):
-            brick_w = brick_sizes.get((x, y), 0)
-            if brick_w == 0:
-                continue
-            
-            r, g, b, a = color_map.get((x, y), (0, 0, 0, 0))
-            
-            # Calculate brick position based on pixel coordinates to preserve shape
-            brick_x = x * (block_width // 2)  # Each pixel x-position is half-width unit
-            
-            # Y position: space bricks by inner_body_height so upper brick bodies
-            # sit on top of lower brick studs, hiding them naturally
-            # Add vertical_offset to center content in square outputs
-            brick_y = y * inner_body_height + vertical_offset
-            
-            # All bricks show studs - they're always visible from the side view
-            show_studs = True
-            
-            # Determine brick type based on width
-            # brick_w can be: 12 (1x), 24 (2x), 36 (3x), or 48 (4x)
-            if brick_w == block_width // 2:
-                btype = "1x1"
-            elif brick_w == block_width:
-                btype = "2x2"
-            elif brick_w == block_width * 3 // 2:
-                btype = "3x3"
-            elif brick_w == block_width * 2:
-                btype = "4x4"
-            else:
-                btype = "2x2"  # Default fallback
+    placements = iter_brick_placements(brick_sizes, rgb, block_width, block_height, vertical_offset, cull=cull)
+    
+    if compact:
+        yield COMPACT_STYLE
+    if row_delay is not None:
+        yield ANIMATION_STYLE
+    
+    # Symbol mode: draw each brick variant that occurs once, at the origin.
+    # The variants are collected in a separate pass over the layout so the
+    # placements never have to be held in memory all at once.
+    if symbols:
+        variants = sorted({(brick_w, hidden_studs, top_border)
+                           for _, _, brick_w, _, hidden_studs, top_border
+                           in iter_brick_placements(brick_sizes, rgb, block_width, block_height, vertical_offset,
+                                                    cull=cull)},
+                          key=lambda variant: (variant[0], variant[1], not variant[2]))
+        yield '  <defs>'
+        for brick_w, hidden_studs, top_border in variants:
+            yield from create_brick_symbol(brick_w, body_height, block_width, hidden_studs, top_border,
+                                           compact=compact, precision=precision)
+        yield '  </defs>'
+    
+    culled = 0
+    row_y = None
+    rows = 0
+    for brick_x, brick_y, brick_w, color, hidden_studs, top_border in placements:
+        if row_delay is not None and brick_y != row_y:
+            # Animated: one group per row of bricks, shown row_delay ms after the row below
+            if row_y is not None:
+                yield '  </g>'
+            yield f'  <g class="row" style="animation-delay:{rows * row_delay}ms">'
+            row_y = brick_y
+            rows += 1
+        
+        # Each hidden stud is its fill rect (the outline is still drawn)
+        culled += len(hidden_studs) + (0 if top_border else 1)
+        
+        if symbols:
+            yield create_brick_use(brick_x, brick_y, brick_w, color, block_width, hidden_studs, top_border,
+                                   compact=compact, precision=precision)
+            continue
+        
+        # All bricks show studs - they're always visible from the side view
+        show_studs = True
+        
+        # Determine brick type based on width
+        btype = brick_type_for_width(brick_w, block_width)
+        
+        # Create brick from side view - NO SHADING, only original RGB color
+        # Opacity is ignored - we use only opaque bricks
+        # All bricks have studs for consistent appearance
+        # Use body_height as brick total height (stud will be part of it)
+        yield from create_brick_side_view(
+            brick_x, brick_y, brick_w, body_height,
+            color,
+            show_studs=show_studs,
+            brick_type=btype,
+            hidden_studs=hidden_studs,
+            top_border=top_border,
+            compact=compact,
+            precision=precision
+        )
+    
+    if row_y is not None:
+        yield '  </g>'
+    
+    if stats is not None:
+        stats['culled'] = culled
+
+
+def iter_brick_svg(img, block_width=24, block_height=20, min_alpha=128, brick_type="auto", symbols=False,
+                   cull=False, stats=None, brick_sizes=None, compact=False, precision=None, row_delay=None):
+    """Yield the lines of the complete brick SVG document, row by row.
+    
+    Arguments are the same as for image_to_brick_svg. Nothing but the current
+    row is held in memory, so this is what large mosaics should be written from.
+    """
+    width, height = img.size
+    
+    # Calculate actual SVG dimensions (square outputs are padded and centered)
+    svg_width, svg_height, _ = brick_svg_size(width, height, block_width, block_height)
+    
+    if symbols:
+        namespaces = 'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"'
+    else:
+        namespaces = 'xmlns="http://www.w3.org/2000/svg"'
+    yield '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+    yield f'<svg width="{svg_width}" height="{svg_height}" viewBox="0 0 {svg_width} {svg_height}" '
+    yield f'     {namespaces}>'
+    yield f'  <desc>Brick-style blocky version - {brick_type} bricks side view</desc>'
+    
+    yield from iter_brick_svg_elements(
+        img, block_width, block_height, min_alpha, brick_type,
+        symbols=symbols, cull=cull, stats=stats, brick_sizes=brick_sizes, compact=compact, precision=precision,
+        row_delay=row_delay
+    )
+    
+    yield '</svg>'
+
+
+def image_to_brick_svg(img, block_width=24, block_height=20, min_alpha=128, brick_type="auto", symbols=False,
+                       cull=False, stats=None, brick_sizes=None, compact=False, precision=None, row_delay=None):
+    """Convert PIL Image to brick-style blocky SVG with adaptive brick sizing.
+    
+    Args:
+        block_width: Width for 2x2 bricks (1x1=12px, 2x2=24px, 3x3=36px, 4x4=48px)
+        block_height: Height for all bricks (5/6 of block_width for proper ratio)
+        brick_type: "auto" (adaptive 1x1/2x2/3x3/4x4), "optimal" (adaptive, fewest bricks), "1x1", "2x2", "3x3", or "4x4"
+        symbols: Define each brick type once in <defs> and place bricks with <use>
+        cull: Skip stud fills hidden under the row above (the image rendered at the SVG's size is unchanged)
+        stats: Optional dict, filled with the number of culled elements ("culled")
+        brick_sizes: Precomputed brick grid from compute_brick_grid (e.g. from the cache)
+        compact: Style hairlines through one shared <style> block and write hex colors
+        precision: Round coordinates to this many decimals (None = exact)
+        row_delay: Build-up animation: show the rows of bricks one by one from the
+            bottom, row_delay milliseconds apart, through CSS (None = static)
+    
+    Returns:
+        The whole document as one string (see write_brick_svg for large outputs)
+    """
+    return '\n'.join(iter_brick_svg(img, block_width, block_height, min_alpha, brick_type, symbols=symbols,
+                                    cull=cull, stats=stats, brick_sizes=brick_sizes, compact=compact,
+                                    precision=precision, row_delay=row_delay))
+
+
+def open_svg_output(output_svg):
+    """Open an SVG output file for text writing (gzip-compressed for .svgz)."""
+    if output_svg.endswith('.svgz'):
+        return gzip.open(output_svg, 'wt', encoding='utf-8')
+    return open(output_svg, 'w', encoding='utf-8')
+
+
+def write_brick_svg(lines, output_svg):
+    """Stream SVG lines to output_svg as they are produced.
+    
+    The file content is identical to '\\n'.join(lines), but only one line is
+    held in memory at a time.
+    
+    Returns:
+        Number of lines written
+    """
+    count = 0
+    with brick_profile.stage('svg.write'), open_svg_output(output_svg) as f:
+        for line in lines:
+            if count:
+                f.write('\n')
+            f.write(line)
+            count += 1
+    brick_profile.output(output_svg)
+    return count
+
+
+def cached_svg_to_image(svg_data, width, cache_dir, tile_rows=None):
+    """svg_data_to_image with the low-res raster stored in the build cache.
+    
+    Returns:
+        (img, raster_key) - the key identifies the raster for dependent entries
+    """
+    raster_key = brick_cache.cache_key('raster', brick_cache.data_digest(svg_data), width, tile_rows)
+    entry = brick_cache.lookup(cache_dir, raster_key, ['raster.png'])
+    if entry is not None:
+        try:
+            img = Image.open(os.path.join(entry, 'raster.png'))
+            img.load()
+            brick_profile.count('cache.raster_hit')
+            return img, raster_key
+        except FileNotFoundError:
+            # Replaced or evicted since the lookup: a miss
+            pass
+    
+    if tile_rows:
+        img = svg_data_to_image_tiled(svg_data, width=width, tile_rows=tile_rows)
+    else:
+        img = svg_data_to_image(svg_data, width=width)
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    brick_cache.store(cache_dir, raster_key, {'raster.png': buffer.getvalue()})
+    return img, raster_key
+
+
+def cached_brick_grid(img, raster_key, block_width, brick_type, cache_dir, min_alpha=128, variant_layouts=None):
+    """compute_brick_grid for a cached raster, with the layout stored in the build cache.
+    
+    Layouts are keyed by layout_signature, so colour variants of a logo share
+    one cache entry (and one packing pass).
+    """
+    opaque, rgb = image_to_arrays(img, min_alpha)
+    signature = layout_signature(opaque, rgb)
+    layout_key = brick_cache.cache_key('layout', signature or raster_key, block_width, brick_type, min_alpha)
+    entry = brick_cache.lookup(cache_dir, layout_key, ['layout.npy'])
+    if entry is not None:
+        try:
+            brick_sizes = np.load(os.path.join(entry, 'layout.npy'))
+            brick_profile.count('cache.layout_hit')
+            return brick_sizes
+        except FileNotFoundError:
+            # Replaced or evicted since the lookup: a miss
+            pass
+    
+    brick_sizes = variant_brick_grid(opaque, rgb, block_width, brick_type, variant_layouts)
+    buffer = io.BytesIO()
+    np.save(buffer, brick_sizes)
+    brick_cache.store(cache_dir, layout_key, {'layout.npy': buffer.getvalue()})
+    return brick_sizes
+
+
+def rasterize_and_pack(svg_data, pixel_width=20, block_width=24, brick_type="auto", cache_dir=None, tile_rows=None,
+                       variant_layouts=None):
+    """Rasterize in-memory SVG bytes and compute its brick layout.
+    
+    With tile_rows, the SVG is rasterized in bands of that many rows (see
+    iter_svg_bands) and each band is packed as soon as it is rendered.
+    With variant_layouts (see variant_brick_grid), a colour variant of an
+    image packed before reuses its layout; tiled runs always pack.
+    
+    Returns:
+        (img, brick_sizes) - the low-res image and the grid from compute_brick_grid
+    """
+    if cache_dir:
+        img, raster_key = cached_svg_to_image(svg_data, pixel_width, cache_dir, tile_rows)
+        brick_sizes = cached_brick_grid(img, raster_key, block_width, brick_type, cache_dir,
+                                        variant_layouts=variant_layouts)
+    elif tile_rows:
+        bands = []
+        grids = []
+        state = {}
+        for _, band in iter_svg_bands(svg_data, pixel_width, tile_rows):
+            opaque, rgb = image_to_arrays(band)
+            grids.append(compute_brick_grid(opaque, rgb, block_width, brick_type, state=state))
+            bands.append(np.asarray(band))
+        img = Image.fromarray(np.concatenate(bands), 'RGBA')
+        brick_sizes = np.concatenate(grids)
+    else:
+        img = svg_data_to_image(svg_data, width=pixel_width)
+        brick_sizes = variant_brick_grid(*image_to_arrays(img), block_width, brick_type, variant_layouts)
+    
+    if brick_profile.enabled():
+        for btype, n in brick_type_counts(brick_sizes, block_width).items():
+            brick_profile.count(f'bricks.{btype}', n)
+    return img, brick_sizes
+
+
+def quantize_and_pack(input_path, pixel_width=20, block_width=24, brick_type="auto", palette=None,
+                      variant_layouts=None):
+    """rasterize_and_pack for a raster image (PNG, JPEG, ...) instead of SVG.
+    
+    The image is downscaled and quantized to the brick palette (see
+    brick_palette.raster_to_image) before packing.
+    
+    Returns:
+        (img, brick_sizes) as from rasterize_and_pack
+    """
+    img = brick_palette.raster_to_image(input_path, pixel_width, palette)
+    brick_sizes = variant_brick_grid(*image_to_arrays(img), block_width, brick_type, variant_layouts)
+    
+    if brick_profile.enabled():
+        for btype, n in brick_type_counts(brick_sizes, block_width).items():
+            brick_profile.count(f'bricks.{btype}', n)
+    return img, brick_sizes
+
+
+def viewbox_fit(viewbox, pixel_width, pixel_height):
+    """How a renderer fits a viewBox into pixel_width × pixel_height (xMidYMid meet).
+    
+    Returns:
+        (scale, offset_x, offset_y) - pixels per viewBox unit and the centring offset
+    """
+    _, _, vb_w, vb_h = viewbox
+    scale = min(pixel_width / vb_w, pixel_height / vb_h)
+    return scale, (pixel_width - vb_w * scale) / 2, (pixel_height - vb_h * scale) / 2
+
+
+def svg_data_to_images(svg_data, widths, reference_width=None):
+    """Rasterize SVG bytes once and downscale the result to several pixel widths.
+    
+    The SVG is rendered a single time at 4× reference_width (default: the
+    largest width). For every requested width, each output pixel takes the
+    reference pixel under the centre of the source pixel svg_data_to_image
+    would pick at that width, so the results match svg_data_to_image up to
+    anti-aliasing at shape edges (exactly at the reference width).
+    
+    Returns:
+        Dict of width -> RGBA PIL Image
+    """
+    reference_width = reference_width or max(widths)
+    root = ET.fromstring(svg_data)
+    viewbox = svg_raster_geometry(root, reference_width)[0]
+    
+    with svg_surface_pixels(svg_data, reference_width * 4) as pixels, brick_profile.stage('rasterize.downscale'):
+        reference_height, reference_source_width = pixels.shape[:2]
+        reference_fit = viewbox_fit(viewbox, reference_source_width, reference_height)
+        
+        images = {}
+        for width in widths:
+            _, source_width, source_height, height = svg_raster_geometry(root, width)
+            scale, offset_x, offset_y = viewbox_fit(viewbox, source_width, source_height)
             
-            # Create brick from side view - NO SHADING, only original RGB color
-            # Opacity is ignored - we use only opaque bricks
-            # All bricks have studs for consistent appearance
-            # Use body_height as brick total height (stud will be part of it)
-            brick_elements = create_brick_side_view(
-                brick_x, brick_y, brick_w, body_height,
-                (r, g, b),
-                show_studs=show_studs,
-                brick_type=btype
-            )
+            # Source pixels svg_data_to_image samples at this width ...
+            columns = nearest_indices(width, source_width)
+            rows = nearest_indices(height, source_height)
             
-            svg_parts.extend(brick_elements)
+            # ... and the reference pixels under their centres, mapped through viewBox units
+            columns = ((columns + 0.5 - offset_x) / scale * reference_fit[0] + reference_fit[1]).astype(np.intp)
+            rows = ((rows + 0.5 - offset_y) / scale * reference_fit[0] + reference_fit[2]).astype(np.intp)
+            columns = np.clip(columns, 0, reference_source_width - 1)
+            rows = np.clip(rows, 0, reference_height - 1)
+            images[width] = Image.fromarray(surface_to_rgba(pixels[rows][:, columns]), 'RGBA')
     
-    svg_parts.append('</svg>')
+    return images
+
+
+def rasterize_and_pack_widths(svg_data, pixel_widths, block_width=24, brick_type="auto", reference_width=None,
+                              variant_layouts=None):
+    """rasterize_and_pack for several pixel widths from one rasterization.
     
-    return '\n'.join(svg_parts)
+    Returns:
+        Dict of pixel width -> (img, brick_sizes)
+    """
+    images = svg_data_to_images(svg_data, pixel_widths, reference_width)
+    layouts = {}
+    for width, img in images.items():
+        brick_sizes = variant_brick_grid(*image_to_arrays(img), block_width, brick_type, variant_layouts)
+        if brick_profile.enabled():
+            for btype, n in brick_type_counts(brick_sizes, block_width).items():
+                brick_profile.count(f'bricks.{btype}', n)
+        layouts[width] = (img, brick_sizes)
+    return layouts
 
 
-def blockify_svg(input_svg, output_svg, pixel_width=20, block_width=24, block_height=20, brick_type="auto"):
+def blockify_svg(input_svg, output_svg, pixel_width=20, block_width=24, block_height=20, brick_type="auto", symbols=False,
+                 cull=False, cache_dir=None, png_path=None, webp_path=None, raster_width=None, tile_rows=None,
+                 variant_layouts=None, layout_path=None, compact=False, precision=None, palette=None,
+                 webp_effort=None):
     """
     Main function to convert SVG to blocky brick style.
     
     Args:
-        input_svg: Path to input SVG file
-        output_svg: Path to output SVG file
+        input_svg: Path to input SVG file, or a raster image (PNG, JPEG, ...) that is
+            quantized to the brick palette
+        output_svg: Path to output SVG file (.svgz is written gzip-compressed)
         pixel_width: Width in "pixels" for the rasterization (lower = blockier)
         block_width: Width of 2x2 brick in output (default 24, will be halved for 1x1)
         block_height: Height of bricks (default 20, which is 5/6 of 24 for proper ratio)
-        brick_type: "auto" (adaptive), "1x1", or "2x2" brick type
+        brick_type: "auto" (adaptive), "optimal" (adaptive, fewest bricks), "1x1", or "2x2" brick type
+        symbols: Write shared brick symbols in <defs> placed with <use> (smaller files)
+        cull: Leave out stud fills hidden under the row above
+        cache_dir: Build cache directory for the low-res raster and brick layout (None = no cache)
+        png_path, webp_path, raster_width: Also render PNG/WebP at raster_width pixels wide,
+            drawn directly from the brick layout (no SVG re-rasterization)
+        webp_effort: None for lossy WebP, 0-6 for lossless WebP at that effort (see encode_raster)
+        tile_rows: Rasterize and pack in bands of this many rows (bounded memory for huge pixel widths)
+        variant_layouts: Dict shared across calls so colour variants of a logo are packed only once
+            (see variant_brick_grid)
+        layout_path: Also save the brick layout as a .bricks file (see brick_layout.py), which
+            render_layout can turn into any output format without packing again
+        compact: Smaller SVG - hairlines styled by one shared <style> block, hex colors
+        precision: Round SVG coordinates to this many decimals (None = exact)
+        palette: Brick palette for raster inputs (see brick_palette.load_palette; None = default)
     """
     print(f"Converting {input_svg} to blocky brick style ({brick_type} bricks, side view)...")
-    print(f"  Rasterizing to {pixel_width} pixels wide")
+    if brick_palette.is_raster_input(input_svg):
+        print(f"  Quantizing to {pixel_width} pixels wide")
+    else:
+        print(f"  Rasterizing to {pixel_width} pixels wide" + (f" in bands of {tile_rows} rows" if tile_rows else ""))
     print(f"  2x2 brick size: {block_width}×{block_height}px, 1x1 brick size: {block_width//2}×{block_height}px")
     
-    # Convert SVG to low-res image
-    img = svg_to_image(input_svg, width=pixel_width)
+    # Convert the input to a low-res image and decide brick placement
+    if brick_palette.is_raster_input(input_svg):
+        img, brick_sizes = quantize_and_pack(input_svg, pixel_width, block_width, brick_type, palette,
+                                             variant_layouts)
+    else:
+        with open(input_svg, 'rb') as f:
+            svg_data = f.read()
+        img, brick_sizes = rasterize_and_pack(svg_data, pixel_width, block_width, brick_type, cache_dir, tile_rows,
+                                              variant_layouts)
     print(f"  Image size: {img.size}")
     
-    # Convert to brick-style SVG
-    brick_svg = image_to_brick_svg(img, block_width=block_width, block_height=block_height, brick_type=brick_type)
+    write_brick_outputs(img, brick_sizes, output_svg, block_width, block_height, brick_type, symbols=symbols,
+                        cull=cull, png_path=png_path, webp_path=webp_path, raster_width=raster_width,
+                        layout_path=layout_path, compact=compact, precision=precision, webp_effort=webp_effort)
+
+
+def write_brick_outputs(img, brick_sizes, output_svg, block_width=24, block_height=20, brick_type="auto",
+                        symbols=False, cull=False, png_path=None, webp_path=None, raster_width=None,
+                        layout_path=None, compact=False, precision=None, webp_effort=None):
+    """Write the brick SVG (and optionally PNG/WebP and the .bricks layout) for a packed low-res image.
     
-    # Write output
-    with open(output_svg, 'w') as f:
-        f.write(brick_svg)
+    Arguments are the same as for blockify_svg; img and brick_sizes come from
+    rasterize_and_pack or rasterize_and_pack_widths.
+    """
+    if layout_path:
+        _, rgb = image_to_arrays(img)
+        brick_layout.save_layout(brick_layout.layout_from_grid(brick_sizes, rgb, block_width, brick_type), layout_path)
+        brick_profile.output(layout_path)
+        print(f"  Saved brick layout to {layout_path}")
+    
+    # Convert to brick-style SVG, writing each row as soon as it is generated
+    stats = {}
+    write_brick_svg(iter_brick_svg(img, block_width=block_width, block_height=block_height, brick_type=brick_type,
+                                   symbols=symbols, cull=cull, stats=stats, brick_sizes=brick_sizes, compact=compact,
+                                   precision=precision),
+                    output_svg)
+    if cull:
+        print(f"  Culled {stats['culled']} hidden stud fills")
+        brick_profile.count('svg.culled', stats['culled'])
     
     print(f"  Saved to {output_svg}")
+    
+    if png_path and webp_path and raster_width:
+        print(f"  Rendering PNG and WebP from brick layout ({raster_width}px)...")
+        with brick_profile.stage('raster.render'):
+            _, rgb = image_to_arrays(img)
+            raster = render_brick_raster(brick_sizes, rgb, raster_width, block_width, block_height, cull=cull)
+        save_raster(raster, png_path, webp_path, webp_effort)
+    
     # Calculate actual output dimensions with stacking overlap
     stud_height = max(2, int(block_height * 0.15))
     body_height = block_height - stud_height
@@ -447,23 +1632,208 @@ def blockify_svg(input_svg, output_svg, pixel_width=20, block_width=24, block_he
         print(f"  Output size: {output_width}×{output_height}")
 
 
+def blockify_svg_widths(input_svg, output_template, pixel_widths, block_width=24, block_height=20, brick_type="auto",
+                        symbols=False, cull=False, png_template=None, webp_template=None, raster_width=None,
+                        variant_layouts=None, layout_template=None, compact=False, precision=None, palette=None,
+                        webp_effort=None):
+    """Convert one SVG to brick style at several pixel widths, rasterizing it only once.
+    
+    Args:
+        output_template: Output SVG path with a {width} placeholder for the pixel width
+        pixel_widths: Pixel widths to generate (e.g. a merchandise size ladder)
+        png_template, webp_template: Optional PNG/WebP paths with {width}, rendered
+            at raster_width pixels wide
+        layout_template: Optional .bricks layout path with {width}
+        Other arguments as for blockify_svg.
+    """
+    print(f"Converting {input_svg} to blocky brick style ({brick_type} bricks, side view)...")
+    if brick_palette.is_raster_input(input_svg):
+        # Raster inputs are cheap to quantize, so each width is downscaled from the source image
+        print(f"  Quantizing for pixel widths {', '.join(str(width) for width in pixel_widths)}")
+        layouts = {width: quantize_and_pack(input_svg, width, block_width, brick_type, palette, variant_layouts)
+                   for width in pixel_widths}
+    else:
+        print(f"  Rasterizing once for pixel widths {', '.join(str(width) for width in pixel_widths)}")
+        with open(input_svg, 'rb') as f:
+            svg_data = f.read()
+        layouts = rasterize_and_pack_widths(svg_data, pixel_widths, block_width, brick_type,
+                                            variant_layouts=variant_layouts)
+    
+    for width in pixel_widths:
+        img, brick_sizes = layouts[width]
+        print(f"  Pixel width {width}: image size {img.size}")
+        png_path = png_template.format(width=width) if png_template else None
+        webp_path = webp_template.format(width=width) if webp_template else None
+        layout_path = layout_template.format(width=width) if layout_template else None
+        write_brick_outputs(img, brick_sizes, output_template.format(width=width), block_width, block_height,
+                            brick_type, symbols=symbols, cull=cull, png_path=png_path, webp_path=webp_path,
+                            raster_width=raster_width, layout_path=layout_path, compact=compact,
+                            precision=precision, webp_effort=webp_effort)
+
+
+def render_layout(layout_path, output_path, block_width=24, block_height=20, symbols=False, cull=False,
+                  raster_width=None, compact=False, precision=None, webp_effort=None):
+    """Render a saved .bricks layout (see brick_layout.py) without rasterizing or packing.
+    
+    The output format follows the file extension: brick SVG (.svg, .svgz),
+    raster image (.png, .webp; raster_width pixels wide, default the SVG
+    width, encoded as by encode_raster) or parts list (.csv). block_width and
+    block_height may differ from the ones the layout was packed for.
+    """
+    layout = brick_layout.load_layout(layout_path)
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext not in ('.svg', '.svgz', '.png', '.webp', '.csv'):
+        raise ValueError(f"Unsupported output format: {output_path}")
+    
+    if ext == '.csv':
+        brick_layout.write_parts_list(layout, output_path)
+        print(f"Saved parts list to {output_path}")
+        return
+    
+    img = brick_layout.layout_to_image(layout)
+    brick_sizes = brick_layout.layout_brick_sizes(layout, block_width)
+    if ext in ('.svg', '.svgz'):
+        stats = {}
+        write_brick_svg(iter_brick_svg(img, block_width=block_width, block_height=block_height,
+                                       brick_type=layout['brick_type'], symbols=symbols, cull=cull, stats=stats,
+                                       brick_sizes=brick_sizes, compact=compact, precision=precision),
+                        output_path)
+        if cull:
+            print(f"  Culled {stats['culled']} hidden stud fills")
+    else:
+        raster_width = raster_width or brick_svg_size(img.width, img.height, block_width, block_height)[0]
+        _, rgb = image_to_arrays(img)
+        raster = render_brick_raster(brick_sizes, rgb, raster_width, block_width, block_height, cull=cull)
+        with open(output_path, 'wb') as f:
+            f.write(encode_raster(raster, ext[1:], webp_effort))
+    print(f"Saved {layout_path} to {output_path}")
+
+
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python brick_blockify.py <input.svg> <output.svg> [pixel_width] [block_width] [block_height] [brick_type]")
+    if sys.argv[1:2] == ['batch']:
+        # Batch mode: process a whole manifest of logos in this interpreter
+        import brick_batch
+        brick_batch.main(sys.argv[2:])
+        sys.exit(0)
+    
+    if sys.argv[1:2] == ['watch']:
+        # Watch mode: rebuild manifest jobs as their sources change
+        import brick_watch
+        brick_watch.main(sys.argv[2:])
+        sys.exit(0)
+    
+    if sys.argv[1:2] == ['serve']:
+        # Serve mode: render brick logos on demand over HTTP on localhost
+        import brick_serve
+        brick_serve.main(sys.argv[2:])
+        sys.exit(0)
+    
+    if sys.argv[1:2] == ['animate']:
+        # Animate mode: draw a saved brick layout assembling row by row
+        import brick_animate
+        brick_animate.main(sys.argv[2:])
+        sys.exit(0)
+    
+    if sys.argv[1:2] == ['render']:
+        # Render mode: draw a saved brick layout in another format or size
+        args = [arg for arg in sys.argv[2:] if not arg.startswith('--')]
+        raster_width = None
+        precision = None
+        webp_effort = None
+        for arg in sys.argv[2:]:
+            if arg.startswith('--raster-width='):
+                raster_width = int(arg.split('=', 1)[1])
+            elif arg == '--webp-lossless':
+                webp_effort = DEFAULT_WEBP_EFFORT
+            elif arg.startswith('--webp-lossless='):
+                webp_effort = int(arg.split('=', 1)[1])
+            elif arg.startswith('--precision='):
+                precision = int(arg.split('=', 1)[1])
+        if len(args) < 2:
+            print("Usage: python brick_blockify.py render [--symbols] [--cull] [--compact] [--precision=N] [--raster-width=N] [--webp-lossless[=EFFORT]] <layout.bricks> <output> [block_width] [block_height]")
+            print("  output: .svg/.svgz (brick SVG), .png/.webp (raster image) or .csv (parts list)")
+            print("  --raster-width=N: Width of PNG/WebP output (default: the SVG width)")
+            print(f"  --webp-lossless[=EFFORT]: Lossless WebP, EFFORT 0-6 (default: {DEFAULT_WEBP_EFFORT}); PNGs are")
+            print("                           palette-indexed whenever they have at most 256 colors")
+            sys.exit(1)
+        render_layout(args[0], args[1], int(args[2]) if len(args) > 2 else 24, int(args[3]) if len(args) > 3 else 20,
+                      symbols='--symbols' in sys.argv[2:], cull='--cull' in sys.argv[2:], raster_width=raster_width,
+                      compact='--compact' in sys.argv[2:], precision=precision, webp_effort=webp_effort)
+        sys.exit(0)
+    
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    symbols = '--symbols' in sys.argv[1:]
+    cull = '--cull' in sys.argv[1:]
+    compact = '--compact' in sys.argv[1:]
+    profile = brick_profile.profile_path(sys.argv[1:])
+    tile_rows = None
+    layout_path = None
+    precision = None
+    palette = None
+    for arg in sys.argv[1:]:
+        if arg == '--tiles':
+            tile_rows = DEFAULT_TILE_ROWS
+        elif arg.startswith('--tiles='):
+            tile_rows = int(arg.split('=', 1)[1])
+        elif arg.startswith('--layout='):
+            layout_path = arg.split('=', 1)[1]
+        elif arg.startswith('--precision='):
+            precision = int(arg.split('=', 1)[1])
+        elif arg.startswith('--palette='):
+            palette = arg.split('=', 1)[1]
+    
+    if len(args) < 2:
+        print("Usage: python brick_blockify.py [--symbols] [--cull] [--compact] [--precision=N] [--tiles[=ROWS]] [--layout=FILE] [--palette=SPEC] [--profile[=FILE]] <input.svg> <output.svg> [pixel_width] [block_width] [block_height] [brick_type]")
+        print("       python brick_blockify.py batch <manifest.json> [group ...] [--svg-only] [--jobs N]")
+        print("       python brick_blockify.py render <layout.bricks> <output> [block_width] [block_height]")
+        print("       python brick_blockify.py animate <layout.bricks> <output.webp|.gif|.svg> [block_width] [block_height]")
+        print("       python brick_blockify.py watch [manifest.json] [group ...] [--svg-only] [--interval=S]")
+        print("       python brick_blockify.py serve [manifest.json] [--port=N] [--workers=N] [--cache-size=MB]")
+        print("  input.svg: SVG logo, or a raster image (.png, .jpg, ...) quantized to the brick palette")
         print("  pixel_width: Width in pixels for rasterization (default: 20, lower = blockier)")
+        print("               A comma separated list (e.g. 20,40,80) rasterizes once and writes one output")
+        print("               per width; {width} in output.svg is replaced by the width (default: name-{width}.svg)")
         print("  block_width: Width of 2x2 brick (default: 24, 1x1 is half)")
         print("  block_height: Height of bricks (default: 20, which is 5/6 of 24)")
-        print("  brick_type: 'auto' (adaptive), '1x1', or '2x2' (default: auto)")
+        print("  brick_type: 'auto' (adaptive), 'optimal' (adaptive, fewest bricks), '1x1', or '2x2' (default: auto)")
+        print("  --symbols: Define each brick type once in <defs> and place bricks with <use>")
+        print("  --cull: Leave out stud fills hidden under the row above")
+        print("  --compact: Style hairlines through one shared <style> block and write hex colors")
+        print("  --precision=N: Round coordinates to N decimals")
+        print("  output.svg: Written gzip-compressed when the name ends in .svgz")
+        print(f"  --tiles[=ROWS]: Rasterize in bands of ROWS output rows (default: {DEFAULT_TILE_ROWS}) to bound memory")
+        print("  --layout=FILE: Also save the brick layout (.bricks) for the render command; {width} as in output.svg")
+        print("  --palette=SPEC: Brick colors for raster inputs: comma separated hex colors or a JSON file")
+        print("                  (default: common brick colors, see brick_palette.py)")
+        print(f"  --profile[=FILE]: Write per-stage timings and counters as JSON (default: {brick_profile.DEFAULT_PROFILE},")
+        print(f"                    also enabled by ${brick_profile.ENV_VAR}=FILE)")
         print("")
         print("Note: Real brick proportions are 0.6\" × 0.5\" (width × height)")
         print("      So height = 5/6 of width. Default 24×20 maintains this ratio.")
         sys.exit(1)
     
-    input_svg = sys.argv[1]
-    output_svg = sys.argv[2]
-    pixel_width = int(sys.argv[3]) if len(sys.argv) > 3 else 20
-    block_width = int(sys.argv[4]) if len(sys.argv) > 4 else 24
-    block_height = int(sys.argv[5]) if len(sys.argv) > 5 else 20
-    brick_type = sys.argv[6] if len(sys.argv) > 6 else "auto"
+    input_svg = args[0]
+    output_svg = args[1]
+    pixel_widths = [int(width) for width in args[2].split(',')] if len(args) > 2 else [20]
+    block_width = int(args[3]) if len(args) > 3 else 24
+    block_height = int(args[4]) if len(args) > 4 else 20
+    brick_type = args[5] if len(args) > 5 else "auto"
     
-    blockify_svg(input_svg, output_svg, pixel_width, block_width, block_height, brick_type)
+    if profile:
+        brick_profile.start(input_svg)
+    if len(pixel_widths) > 1:
+        if '{width}' not in output_svg:
+            base, ext = os.path.splitext(output_svg)
+            output_svg = base + '-{width}' + ext
+        if layout_path and '{width}' not in layout_path:
+            base, ext = os.path.splitext(layout_path)
+            layout_path = base + '-{width}' + ext
+        blockify_svg_widths(input_svg, output_svg, pixel_widths, block_width, block_height, brick_type,
+                            symbols=symbols, cull=cull, layout_template=layout_path, compact=compact,
+                            precision=precision, palette=palette)
+    else:
+        blockify_svg(input_svg, output_svg, pixel_widths[0], block_width, block_height, brick_type, symbols=symbols,
+                     cull=cull, tile_rows=tile_rows, layout_path=layout_path, compact=compact, precision=precision,
+                     palette=palette)
+    if profile:
+        brick_profile.write(profile, [brick_profile.finish()])
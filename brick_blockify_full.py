@@ -1,21 +1,25 @@
 #!/usr/bin/env python3
 """
 Process full logos with subtitles - blockify only the main title, keep subtitle as vector.
+
+Everything happens in memory: the title is rasterized from SVG bytes, the
+brick elements are written straight into the combined document.
 """
 
 import sys
+import os
 import xml.etree.ElementTree as ET
-from pathlib import Path
-import subprocess
-import tempfile
 import re
 import copy
 
+import brick_profile
+from brick_blockify import rasterize_and_pack, rasterize_and_pack_widths, iter_brick_svg_elements, brick_svg_size, open_svg_output
+
 def extract_title_and_subtitle(svg_path):
     """Extract title and subtitle portions from full logo.
     
     Returns:
-        title_svg_path: Path to temporary SVG with just the title
+        title_svg_data: SVG document (bytes) with just the title
         subtitle_elements: List of XML elements that form the subtitle
         original_viewbox: Original viewbox dimensions
         title_bottom_y: Y coordinate where title ends (subtitle starts)
@@ -70,37 +74,40 @@ def extract_title_and_subtitle(svg_path):
     for elem in title_elements:
         title_root.append(elem)
     
-    # Write title SVG to temp file
-    temp_svg = tempfile.NamedTemporaryFile(mode='w', suffix='.svg', delete=False)
-    tree = ET.ElementTree(title_root)
-    tree.write(temp_svg.name, encoding='unicode', xml_declaration=True)
-    temp_svg.close()
+    # Serialize title SVG in memory
+    title_svg_data = ET.tostring(title_root, encoding='utf-8', xml_declaration=True)
     
-    return temp_svg.name, subtitle_elements, (vb_x, vb_y, vb_w, vb_h), title_bottom_y
+    return title_svg_data, subtitle_elements, (vb_x, vb_y, vb_w, vb_h), title_bottom_y
 
 
-def combine_brick_title_with_vector_subtitle(brick_svg, subtitle_elements, original_viewbox, title_bottom_y, output_svg):
-    """Combine bricked title with original vector subtitle.
+def iter_full_logo_svg(brick_elements, brick_size, subtitle_elements, original_viewbox, title_bottom_y,
+                       symbols=False):
+    """Yield the lines of a bricked title combined with the original vector subtitle.
+    
+    The brick element lines are passed straight through into the document,
+    so the (large) brick SVG is never serialized separately or parsed back.
     
     Args:
-        brick_svg: Path to the blockified title SVG
+        brick_elements: Iterable of SVG element lines for the title bricks
+                        (from iter_brick_svg_elements)
+        brick_size: (width, height) of the brick title
         subtitle_elements: List of XML elements containing the subtitle
         original_viewbox: Tuple of (x, y, width, height) from original SVG
         title_bottom_y: Y coordinate where subtitle should start
-        output_svg: Path to save the combined result
-    """
-    # Parse brick SVG
-    brick_tree = ET.parse(brick_svg)
-    brick_root = brick_tree.getroot()
+        symbols: The brick elements use <use xlink:href> (declares the xlink namespace)
     
+    Yields:
+        Lines of the SVG document, without line endings
+    """
     # Register namespaces
     ET.register_namespace('', 'http://www.w3.org/2000/svg')
     ET.register_namespace('sodipodi', 'http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd')
     ET.register_namespace('inkscape', 'http://www.inkscape.org/namespaces/inkscape')
+    ET.register_namespace('xlink', 'http://www.w3.org/1999/xlink')
     
-    # Get brick SVG dimensions
-    brick_vb = brick_root.get('viewBox', '0 0 400 400').split()
-    brick_x, brick_y, brick_w, brick_h = map(float, brick_vb)
+    # Brick SVG dimensions
+    brick_x, brick_y = 0.0, 0.0
+    brick_w, brick_h = map(float, brick_size)
     
     # Get original dimensions
     orig_x, orig_y, orig_w, orig_h = original_viewbox
@@ -115,25 +122,14 @@ def combine_brick_title_with_vector_subtitle(brick_svg, subtitle_elements, origi
     # Create new combined SVG
     total_height = brick_h + subtitle_height_scaled
     
-    new_root = ET.Element('{http://www.w3.org/2000/svg}svg')
-    new_root.set('width', str(brick_w))
-    new_root.set('height', str(total_height))
-    new_root.set('viewBox', f'{brick_x} {brick_y} {brick_w} {total_height}')
-    new_root.set('version', '1.1')
-    
-    # Copy defs from brick SVG if present
-    for child in brick_root:
-        if child.tag.endswith('defs'):
-            new_root.append(copy.deepcopy(child))
-    
-    # Add brick title (all content from brick SVG except defs)
-    for child in brick_root:
-        if not child.tag.endswith('defs') and not child.tag.endswith('namedview'):
-            new_root.append(copy.deepcopy(child))
+    namespaces = 'xmlns="http://www.w3.org/2000/svg"'
+    if symbols:
+        namespaces += ' xmlns:xlink="http://www.w3.org/1999/xlink"'
     
     # Add subtitle with proper positioning and scaling
+    subtitle_group = None
     if subtitle_elements:
-        subtitle_group = ET.SubElement(new_root, '{http://www.w3.org/2000/svg}g')
+        subtitle_group = ET.Element('{http://www.w3.org/2000/svg}g')
         subtitle_group.set('id', 'vector-subtitle')
         
         # The subtitle starts at title_bottom_y in the original coordinate system
@@ -151,63 +147,156 @@ def combine_brick_title_with_vector_subtitle(brick_svg, subtitle_elements, origi
         for elem in subtitle_elements:
             subtitle_group.append(copy.deepcopy(elem))
     
-    # Write output
-    tree = ET.ElementTree(new_root)
-    tree.write(output_svg, encoding='unicode', xml_declaration=True)
+    # Root, brick title elements, then the vector subtitle
+    yield "<?xml version='1.0' encoding='UTF-8'?>"
+    yield (f'<svg {namespaces} width="{brick_w}" height="{total_height}" '
+           f'viewBox="{brick_x} {brick_y} {brick_w} {total_height}" version="1.1">')
+    yield '  <desc>Brick-style blocky version - auto bricks side view</desc>'
+    yield from brick_elements
+    if subtitle_group is not None:
+        yield '  ' + ET.tostring(subtitle_group, encoding='unicode')
+    yield '</svg>'
+
+
+def combine_brick_title_with_vector_subtitle(brick_elements, brick_size, subtitle_elements, original_viewbox,
+                                             title_bottom_y, output_svg, symbols=False):
+    """Combine bricked title with original vector subtitle.
     
+    Writes the lines of iter_full_logo_svg to output_svg (.svgz is written
+    gzip-compressed) as they are produced; the other arguments are those of
+    iter_full_logo_svg.
+    """
+    with open_svg_output(output_svg) as f:
+        for line in iter_full_logo_svg(brick_elements, brick_size, subtitle_elements, original_viewbox,
+                                       title_bottom_y, symbols):
+            f.write(line)
+            f.write('\n')
+    
+    brick_w, brick_h = map(float, brick_size)
     print(f"  Combined brick title ({brick_w}×{brick_h}) with vector subtitle")
 
 
-def process_full_logo(input_svg, output_svg, pixel_width=30, block_width=24, block_height=20):
-    """Process a full logo: blockify title, keep subtitle as vector."""
+def process_full_logo(input_svg, output_svg, pixel_width=30, block_width=24, block_height=20, symbols=False,
+                      cull=False, cache_dir=None, tile_rows=None, variant_layouts=None, compact=False, precision=None):
+    """Process a full logo: blockify title, keep subtitle as vector.
+    
+    With symbols=True the brick title uses shared <defs>/<use> brick symbols,
+    with cull=True stud fills hidden under the row above are left out.
+    cache_dir enables the build cache for the title's raster and brick layout,
+    tile_rows rasterizes the title in bands of that many rows. variant_layouts
+    is shared across calls so colour variants reuse one title layout.
+    compact and precision shrink the brick markup as for blockify_svg.
+    """
     print(f"Processing full logo: {input_svg}")
     print("  Extracting title and subtitle...")
     
     # Extract title and subtitle
-    title_svg, subtitle_elements, original_viewbox, title_bottom_y = extract_title_and_subtitle(input_svg)
+    with brick_profile.stage('full.extract'):
+        title_svg_data, subtitle_elements, original_viewbox, title_bottom_y = extract_title_and_subtitle(input_svg)
     
     print(f"  Found {len(subtitle_elements)} subtitle element(s)")
     print("  Blockifying title...")
     
-    # Blockify the title portion with auto brick sizing
-    brick_title_svg = tempfile.NamedTemporaryFile(mode='w', suffix='.svg', delete=False).name
+    # Blockify the title portion with auto brick sizing (in memory)
+    img, brick_sizes = rasterize_and_pack(title_svg_data, pixel_width, block_width, 'auto', cache_dir, tile_rows,
+                                          variant_layouts)
+    print(f"  Title image size: {img.size}")
     
-    cmd = [
-        'python3', 'brick_blockify.py',
-        title_svg, brick_title_svg,
-        str(pixel_width), str(block_width), str(block_height), 'auto'
-    ]
+    write_full_logo(img, brick_sizes, subtitle_elements, original_viewbox, title_bottom_y, output_svg,
+                    block_width, block_height, symbols=symbols, cull=cull, compact=compact, precision=precision)
+
+
+def process_full_logo_widths(input_svg, output_template, pixel_widths, block_width=24, block_height=20,
+                             symbols=False, cull=False, variant_layouts=None, compact=False, precision=None):
+    """Process a full logo at several pixel widths, rasterizing the title only once.
+    
+    output_template is the output SVG path with a {width} placeholder.
+    variant_layouts, compact and precision work as for process_full_logo.
+    """
+    print(f"Processing full logo: {input_svg}")
+    print("  Extracting title and subtitle...")
+    
+    with brick_profile.stage('full.extract'):
+        title_svg_data, subtitle_elements, original_viewbox, title_bottom_y = extract_title_and_subtitle(input_svg)
     
-    subprocess.run(cmd, check=True)
+    print(f"  Found {len(subtitle_elements)} subtitle element(s)")
+    print(f"  Blockifying title once for pixel widths {', '.join(str(width) for width in pixel_widths)}...")
+    
+    layouts = rasterize_and_pack_widths(title_svg_data, pixel_widths, block_width, 'auto',
+                                        variant_layouts=variant_layouts)
+    for width in pixel_widths:
+        img, brick_sizes = layouts[width]
+        print(f"  Pixel width {width}: title image size {img.size}")
+        write_full_logo(img, brick_sizes, subtitle_elements, original_viewbox, title_bottom_y,
+                        output_template.format(width=width), block_width, block_height, symbols=symbols, cull=cull,
+                        compact=compact, precision=precision)
+
+
+def write_full_logo(img, brick_sizes, subtitle_elements, original_viewbox, title_bottom_y, output_svg,
+                    block_width=24, block_height=20, symbols=False, cull=False, compact=False, precision=None):
+    """Write a full logo from the packed title image and the extracted subtitle."""
+    stats = {}
+    brick_elements = iter_brick_svg_elements(
+        img, block_width, block_height, brick_type='auto',
+        symbols=symbols, cull=cull, stats=stats, brick_sizes=brick_sizes, compact=compact, precision=precision
+    )
+    brick_w, brick_h, _ = brick_svg_size(img.width, img.height, block_width, block_height)
     
     print("  Combining brick title with vector subtitle...")
     
     # Combine brick title with vector subtitle
-    combine_brick_title_with_vector_subtitle(
-        brick_title_svg, 
-        subtitle_elements, 
-        original_viewbox, 
-        title_bottom_y, 
-        output_svg
-    )
+    with brick_profile.stage('svg.write'):
+        combine_brick_title_with_vector_subtitle(
+            brick_elements,
+            (brick_w, brick_h),
+            subtitle_elements, 
+            original_viewbox, 
+            title_bottom_y, 
+            output_svg,
+            symbols=symbols
+        )
+    brick_profile.output(output_svg)
+    if cull:
+        print(f"  Culled {stats['culled']} hidden stud fills")
+        brick_profile.count('svg.culled', stats['culled'])
     
     print(f"  Saved to {output_svg}")
-    
-    # Cleanup
-    Path(title_svg).unlink()
-    Path(brick_title_svg).unlink()
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python brick_blockify_full.py <input.svg> <output.svg> [pixel_width] [block_width] [block_height]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    symbols = '--symbols' in sys.argv[1:]
+    cull = '--cull' in sys.argv[1:]
+    compact = '--compact' in sys.argv[1:]
+    precision = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--precision='):
+            precision = int(arg.split('=', 1)[1])
+    profile = brick_profile.profile_path(sys.argv[1:])
+    
+    if len(args) < 2:
+        print("Usage: python brick_blockify_full.py [--symbols] [--cull] [--compact] [--precision=N] [--profile[=FILE]] <input.svg> <output.svg> [pixel_width] [block_width] [block_height]")
         print("  Processes 'full' logos: blockifies title, keeps subtitle as vector")
+        print("  pixel_width may be a comma separated list (e.g. 30,60,120): the title is rasterized once and")
+        print("  one output is written per width ({width} in output.svg, default: name-{width}.svg)")
         sys.exit(1)
     
-    input_svg = sys.argv[1]
-    output_svg = sys.argv[2]
-    pixel_width = int(sys.argv[3]) if len(sys.argv) > 3 else 30
-    block_width = int(sys.argv[4]) if len(sys.argv) > 4 else 24
-    block_height = int(sys.argv[5]) if len(sys.argv) > 5 else 20
-    
-    process_full_logo(input_svg, output_svg, pixel_width, block_width, block_height)
+    input_svg = args[0]
+    output_svg = args[1]
+    pixel_widths = [int(width) for width in args[2].split(',')] if len(args) > 2 else [30]
+    block_width = int(args[3]) if len(args) > 3 else 24
+    block_height = int(args[4]) if len(args) > 4 else 20
+    
+    if profile:
+        brick_profile.start(input_svg)
+    if len(pixel_widths) > 1:
+        if '{width}' not in output_svg:
+            base, ext = os.path.splitext(output_svg)
+            output_svg = base + '-{width}' + ext
+        process_full_logo_widths(input_svg, output_svg, pixel_widths, block_width, block_height,
+                                 symbols=symbols, cull=cull, compact=compact, precision=precision)
+    else:
+        process_full_logo(input_svg, output_svg, pixel_widths[0], block_width, block_height, symbols=symbols,
+                          cull=cull, compact=compact, precision=precision)
+    if profile:
+        brick_profile.write(profile, [brick_profile.finish()])
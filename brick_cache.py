@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Content-addressed build cache for brick-style logo generation.
+
+Entries are keyed by a hash of the input bytes, the render parameters and
+the tool version (a hash of the brick_*.py sources), so any change to one of
+them produces a new key. Each entry is a directory holding cached files
+(low-res raster, brick layout, final SVG/PNG/WebP outputs). The cache is
+size-bounded: entries are touched on every hit and the least recently used
+ones are evicted first.
+"""
+
+import sys
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+
+DEFAULT_CACHE_DIR = '.brick-cache'
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024  # bytes
+
+# Sources whose contents define the tool version
+TOOL_SOURCES = ('brick_blockify.py', 'brick_blockify_full.py', 'brick_batch.py', 'brick_cache.py', 'brick_layout.py',
+                'brick_palette.py', 'brick_profile.py')
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version():
+    """Hash of the tool sources - changes whenever the generator code changes."""
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in TOOL_SOURCES:
+        path = os.path.join(base_dir, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_digest(data):
+    """SHA-256 of in-memory bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(kind, *parts):
+    """Build a cache key from an entry kind and JSON-serializable parts."""
+    payload = json.dumps([kind, tool_version(), list(parts)], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def entry_dir(cache_dir, key):
+    """Directory of a cache entry (two-level fan-out like git objects)."""
+    return os.path.join(cache_dir, key[:2], key)
+
+
+def lookup(cache_dir, key, names):
+    """Return the entry directory if it holds all given files, else None.
+
+    A hit marks the entry as recently used. An entry can still be replaced
+    or evicted by another worker after a hit, so readers treat files that
+    have gone missing as a miss (see restore).
+    """
+    path = entry_dir(cache_dir, key)
+    if not all(os.path.exists(os.path.join(path, name)) for name in names):
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def store(cache_dir, key, files):
+    """Store files in a cache entry.
+
+    Args:
+        cache_dir: Cache root directory
+        key: Entry key
+        files: Dict of entry file name -> source path to copy, or bytes to write
+
+    The entry is assembled in a temporary directory and renamed into place,
+    so concurrent workers never see a half-written entry. An existing entry
+    is first renamed aside and only deleted once the new one is in place.
+    """
+    path = entry_dir(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(path))
+    for name, source in files.items():
+        target = os.path.join(staging, name)
+        if isinstance(source, bytes):
+            with open(target, 'wb') as f:
+                f.write(source)
+        else:
+            shutil.copyfile(source, target)
+
+    old = staging + '-old'
+    try:
+        os.rename(path, old)
+    except OSError:
+        # No entry yet, or another worker moved it first
+        old = None
+    try:
+        os.rename(staging, path)
+    except OSError:
+        # Another worker stored the same entry first
+        shutil.rmtree(staging, ignore_errors=True)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def restore(entry, files):
+    """Copy cached files back out: files maps entry file name -> output path.
+
+    Returns:
+        False if a file is missing (the entry was replaced or evicted since
+        the lookup), which callers treat as a miss
+    """
+    try:
+        for name, target in files.items():
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            shutil.copyfile(os.path.join(entry, name), target)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def evict(cache_dir, max_bytes=DEFAULT_CACHE_SIZE):
+    """Delete least recently used entries until the cache fits in max_bytes.
+
+    Returns:
+        Number of entries evicted
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    total = 0
+    for fanout in os.listdir(cache_dir):
+        fanout_dir = os.path.join(cache_dir, fanout)
+        if not os.path.isdir(fanout_dir):
+            continue
+        for key in os.listdir(fanout_dir):
+            path = os.path.join(fanout_dir, key)
+            if key.startswith('.tmp-') or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+            entries.append((os.stat(path).st_mtime, size, path))
+            total += size
+
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted += 1
+    return evicted
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('evict', 'clear'):
+        print("Usage: python brick_cache.py evict [cache_dir] [max_megabytes]")
+        print("       python brick_cache.py clear [cache_dir]")
+        sys.exit(1)
+
+    cache_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CACHE_DIR
+    if sys.argv[1] == 'clear':
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        print(f"Cleared {cache_dir}")
+    else:
+        max_bytes = int(float(sys.argv[3]) * 1024 * 1024) if len(sys.argv) > 3 else DEFAULT_CACHE_SIZE
+        print(f"Evicted {evict(cache_dir, max_bytes)} entries from {cache_dir}")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Compact binary brick layouts.
+
+A layout is the result of packing, independent of how it is drawn: one
+record per brick with its grid position, width in grid cells (1-4, one cell
+is half a 2x2 brick) and an index into a palette of RGB colors. Layouts are
+stored in .bricks files that can be memory-mapped, so SVG, PNG/WebP and
+parts-list output can be rendered from a layout (at any brick size) without
+rasterizing or packing the logo again.
+
+File format (little-endian):
+    8 bytes   magic b'BRICKLY1'
+    24 bytes  grid width, grid height, brick count, palette size (uint32 each),
+              brick type used for packing (8 bytes ASCII, NUL padded)
+    palette   palette size × 3 bytes RGB
+    bricks    brick count × LAYOUT_DTYPE records, in row-major order
+"""
+
+import sys
+import csv
+import struct
+
+import numpy as np
+from PIL import Image
+
+
+LAYOUT_MAGIC = b'BRICKLY1'
+LAYOUT_HEADER = struct.Struct('<IIII8s')
+
+# One brick: grid position, width in grid cells and palette index
+LAYOUT_DTYPE = np.dtype([('x', '<u4'), ('y', '<u4'), ('width', 'u1'), ('color', '<u4')])
+
+# Brick names by width in grid cells (same names as brick_type_for_width)
+BRICK_NAMES = {1: "1x1", 2: "2x2", 3: "3x3", 4: "4x4"}
+
+
+def layout_from_grid(brick_sizes, rgb, block_width=24, brick_type="auto"):
+    """Build a layout from a brick grid (see compute_brick_grid) and its pixel colors.
+
+    Returns:
+        Layout dict: size (grid width, height), brick_type, palette ((n, 3)
+        uint8 array) and bricks (LAYOUT_DTYPE array)
+    """
+    height, width = brick_sizes.shape
+    ys, xs = np.nonzero(brick_sizes)
+    colors = rgb[ys, xs].astype(np.uint32)
+    keys = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+    palette_keys, color_index = np.unique(keys, return_inverse=True)
+
+    bricks = np.empty(len(xs), dtype=LAYOUT_DTYPE)
+    bricks['x'] = xs
+    bricks['y'] = ys
+    bricks['width'] = brick_sizes[ys, xs] // (block_width // 2)
+    bricks['color'] = color_index.ravel()
+
+    palette = np.stack([palette_keys >> 16, (palette_keys >> 8) & 0xff, palette_keys & 0xff], axis=1)
+    return {'size': (width, height), 'brick_type': brick_type, 'palette': palette.astype(np.uint8),
+            'bricks': bricks}
+
+
+def layout_brick_sizes(layout, block_width=24):
+    """Brick grid of a layout (as from compute_brick_grid) for bricks of block_width."""
+    width, height = layout['size']
+    bricks = np.asarray(layout['bricks'])
+    brick_sizes = np.zeros((height, width), dtype=np.int32)
+    brick_sizes[bricks['y'], bricks['x']] = bricks['width'].astype(np.int32) * (block_width // 2)
+    return brick_sizes
+
+
+def layout_to_image(layout):
+    """Low-res RGBA image of a layout: each brick's color over its cells, transparent elsewhere.
+
+    Together with layout_brick_sizes this is what the brick renderers take.
+    """
+    width, height = layout['size']
+    bricks = np.asarray(layout['bricks'])
+    xs = bricks['x'].astype(np.intp)
+    ys = bricks['y'].astype(np.intp)
+    colors = np.concatenate([layout['palette'][bricks['color']], np.full((len(bricks), 1), 255, np.uint8)], axis=1)
+
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    for offset in range(int(bricks['width'].max(initial=0))):
+        covered = bricks['width'] > offset
+        rgba[ys[covered], xs[covered] + offset] = colors[covered]
+    return Image.fromarray(rgba, 'RGBA')
+
+
+def save_layout(layout, path):
+    """Write a layout as a .bricks file."""
+    width, height = layout['size']
+    palette = np.ascontiguousarray(layout['palette'], dtype=np.uint8)
+    bricks = np.ascontiguousarray(layout['bricks'], dtype=LAYOUT_DTYPE)
+    with open(path, 'wb') as f:
+        f.write(LAYOUT_MAGIC)
+        f.write(LAYOUT_HEADER.pack(width, height, len(bricks), len(palette), layout['brick_type'].encode('ascii')))
+        f.write(palette.tobytes())
+        f.write(bricks.tobytes())
+
+
+def load_layout(path, mmap=True):
+    """Read a .bricks file.
+
+    Args:
+        mmap: Memory-map the brick records instead of reading them into memory
+
+    Returns:
+        Layout dict as from layout_from_grid
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(LAYOUT_MAGIC)) != LAYOUT_MAGIC:
+            raise ValueError(f"{path} is not a brick layout file")
+        width, height, count, palette_size, brick_type = LAYOUT_HEADER.unpack(f.read(LAYOUT_HEADER.size))
+        palette = np.frombuffer(f.read(palette_size * 3), dtype=np.uint8).reshape(palette_size, 3)
+        offset = f.tell()
+        if not mmap or count == 0:
+            bricks = np.fromfile(f, dtype=LAYOUT_DTYPE, count=count)
+
+    if mmap and count:
+        bricks = np.memmap(path, dtype=LAYOUT_DTYPE, mode='r', offset=offset, shape=(count,))
+    return {'size': (width, height), 'brick_type': brick_type.rstrip(b'\0').decode('ascii'), 'palette': palette,
+            'bricks': bricks}
+
+
+def parts_list(layout):
+    """Count the bricks of a layout by type and color.
+
+    Returns:
+        List of (brick name, '#rrggbb', count), sorted by brick size and color
+    """
+    bricks = np.asarray(layout['bricks'])
+    pairs, counts = np.unique(bricks['width'].astype(np.int64) << 32 | bricks['color'], return_counts=True)
+    parts = []
+    for pair, n in zip(pairs.tolist(), counts.tolist()):
+        r, g, b = layout['palette'][pair & 0xffffffff].tolist()
+        parts.append((BRICK_NAMES.get(pair >> 32, f"{pair >> 32}x{pair >> 32}"), f'#{r:02x}{g:02x}{b:02x}', n))
+    return parts
+
+
+def write_parts_list(layout, path):
+    """Write the parts list of a layout as CSV (brick, color, count)."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['brick', 'color', 'count'])
+        writer.writerows(parts_list(layout))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("Usage: python brick_layout.py <layout.bricks>")
+        print("  Print the size and parts list of a brick layout")
+        print("  (render it with: python brick_blockify.py render <layout.bricks> <output>)")
+        sys.exit(1)
+
+    layout = load_layout(sys.argv[1])
+    width, height = layout['size']
+    print(f"{sys.argv[1]}: {width}×{height} grid, {len(layout['bricks'])} bricks ({layout['brick_type']}), "
+          f"{len(layout['palette'])} colors")
+    for name, color, n in parts_list(layout):
+        print(f"  {name} {color}: {n}")
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Brick colour palettes and raster (photo) input.
+
+SVG logos use a few flat brand colours, but photos and event images have
+thousands. Raster inputs (PNG, JPEG, ...) are downscaled to the brick grid
+and every pixel is mapped to the nearest colour of a brick palette through
+a precomputed 3D lookup table, so a whole image is quantized with a couple
+of NumPy indexing operations instead of per-pixel color comparisons.
+
+A palette is given as a comma separated list of hex colors
+("#cc0000,#0055bf,...") or as a JSON file holding a list of hex colors or
+an object of color name -> hex color.
+"""
+
+import sys
+import functools
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import brick_profile
+
+
+# Default brick palette: common solid brick colors
+DEFAULT_PALETTE = {
+    'white': '#ffffff',
+    'light bluish gray': '#a0a5a9',
+    'dark bluish gray': '#6c6e68',
+    'black': '#1b2a34',
+    'red': '#c91a09',
+    'dark red': '#720e0f',
+    'orange': '#fe8a18',
+    'yellow': '#f2cd37',
+    'tan': '#e4cd9e',
+    'dark tan': '#958a73',
+    'reddish brown': '#582a12',
+    'lime': '#bbe90b',
+    'green': '#237841',
+    'dark green': '#184632',
+    'medium azure': '#36aebf',
+    'blue': '#0055bf',
+    'dark blue': '#0a3463',
+    'medium lavender': '#ac78ba',
+    'dark pink': '#c870a0',
+    'nougat': '#d09168',
+}
+
+# Bits per channel of the lookup table index (64×64×64 cells)
+LUT_BITS = 6
+
+# File extensions read as raster images instead of SVG
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+
+
+def is_raster_input(path):
+    """True if path is a raster image (by extension) rather than an SVG."""
+    return os.path.splitext(path)[1].lower() in RASTER_EXTENSIONS
+
+
+def parse_color(text):
+    """Parse '#rrggbb' (or 'rrggbb') into an (r, g, b) tuple."""
+    value = text.strip().lstrip('#')
+    if len(value) != 6:
+        raise ValueError(f"Invalid color: {text!r} (expected #rrggbb)")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def load_palette(spec=None):
+    """Brick palette from a spec.
+
+    Args:
+        spec: None (DEFAULT_PALETTE), a JSON file path, a comma separated
+            list of hex colors, or an (n, 3) array of RGB colors
+
+    Returns:
+        (n, 3) uint8 array of palette colors
+    """
+    if spec is None:
+        colors = list(DEFAULT_PALETTE.values())
+    elif not isinstance(spec, str):
+        return np.asarray(spec, dtype=np.uint8).reshape(-1, 3)
+    elif os.path.exists(spec):
+        with open(spec) as f:
+            colors = json.load(f)
+        if isinstance(colors, dict):
+            colors = list(colors.values())
+    else:
+        colors = [color for color in spec.split(',') if color.strip()]
+
+    if not colors:
+        raise ValueError(f"Empty palette: {spec!r}")
+    return np.array([parse_color(color) for color in colors], dtype=np.uint8)
+
+
+@functools.lru_cache(maxsize=16)
+def _palette_lut(palette_bytes, bits):
+    palette = np.frombuffer(palette_bytes, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    shift = 8 - bits
+    centers = (np.arange(1 << bits, dtype=np.int32) << shift) + ((1 << shift) >> 1)
+
+    # Squared distance of every cell centre to every palette color, one
+    # channel at a time: (cells per axis, n) tables broadcast together
+    red, green, blue = ((centers[:, None] - palette[None, :, channel]) ** 2 for channel in range(3))
+    lut = np.empty((1 << bits,) * 3, dtype=np.uint8 if len(palette) <= 256 else np.uint16)
+    for r in range(1 << bits):
+        distances = red[r][None, None, :] + green[:, None, :] + blue[None, :, :]
+        lut[r] = distances.argmin(axis=2)
+    return lut
+
+
+def palette_lut(palette, bits=LUT_BITS):
+    """3D lookup table of the nearest palette color for every RGB cell.
+
+    Channels are truncated to `bits` bits; each cell holds the index of the
+    palette color closest (Euclidean RGB distance) to the cell centre. Tables
+    are cached per palette.
+
+    Returns:
+        (2**bits, 2**bits, 2**bits) array of palette indices
+    """
+    palette = np.ascontiguousarray(palette, dtype=np.uint8)
+    return _palette_lut(palette.tobytes(), bits)
+
+
+def quantize(rgb, palette, bits=LUT_BITS):
+    """Map every pixel of an (..., 3) uint8 RGB array to its nearest palette color.
+
+    Returns:
+        (rgb, indices) - quantized colors and palette indices, same leading shape
+    """
+    palette = np.ascontiguousarray(palette, dtype=np.uint8)
+    lut = palette_lut(palette, bits)
+    shift = 8 - bits
+    indices = lut[rgb[..., 0] >> shift, rgb[..., 1] >> shift, rgb[..., 2] >> shift]
+    return palette[indices], indices
+
+
+def raster_to_image(path, width=200, palette=None, min_alpha=128):
+    """Load a raster image as a low-res RGBA image in brick palette colors.
+
+    The image is area-averaged down to width pixels (keeping its aspect
+    ratio), so each brick cell gets the mean color of the photo region it
+    covers, then quantized to the palette. Pixels below min_alpha become
+    fully transparent, all others fully opaque, like svg_to_image output.
+
+    Args:
+        path: PNG, JPEG, ... file (path or binary file object)
+        width: Width in "pixels" of the brick grid
+        palette: Palette spec as for load_palette (None = DEFAULT_PALETTE)
+
+    Returns:
+        PIL Image in RGBA mode
+    """
+    palette = load_palette(palette)
+    with brick_profile.stage('rasterize.load'):
+        with Image.open(path) as source:
+            img = ImageOps.exif_transpose(source).convert('RGBA')
+        height = max(1, round(img.height * width / img.width))
+        # Premultiplied resampling keeps transparent pixels' colors out of the averages
+        img = img.convert('RGBa').resize((width, height), Image.BOX).convert('RGBA')
+
+    with brick_profile.stage('rasterize.quantize'):
+        rgba = np.array(img)
+        opaque = rgba[:, :, 3] >= min_alpha
+        rgba[:, :, :3], _ = quantize(rgba[:, :, :3], palette)
+        rgba[:, :, :3][~opaque] = 0
+        rgba[:, :, 3] = np.where(opaque, 255, 0)
+    return Image.fromarray(rgba, 'RGBA')
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    palette = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--palette='):
+            palette = arg.split('=', 1)[1]
+
+    if len(args) < 2:
+        print("Usage: python brick_palette.py [--palette=SPEC] <input image> <output.png> [pixel_width]")
+        print("  Write the low-res, palette-quantized image a raster input is packed from")
+        print("  --palette=SPEC: Comma separated hex colors or a JSON file (default: common brick colors)")
+        print("  (brick it with: python brick_blockify.py [--palette=SPEC] <input image> <output.svg> [pixel_width])")
+        sys.exit(1)
+
+    img = raster_to_image(args[0], int(args[2]) if len(args) > 2 else 200, palette)
+    img.save(args[1])
+    print(f"Saved {img.size[0]}×{img.size[1]} quantized image to {args[1]}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Opt-in instrumentation for the brick pipeline.
+
+Profiling is enabled with --profile[=FILE] on the command line or the
+BRICK_PROFILE=FILE environment variable. While a report is active the
+pipeline records per-stage wall times, counters (bricks by type, packing
+rewrites, cache hits) and the bytes written per output; the report is
+written as JSON when the run finishes. With profiling off every hook is a
+cheap no-op.
+"""
+
+import contextlib
+import json
+import os
+import time
+
+
+ENV_VAR = 'BRICK_PROFILE'
+DEFAULT_PROFILE = 'brick-profile.json'
+
+# Report of the current run (None = profiling disabled)
+_report = None
+
+
+def profile_path(argv):
+    """Report file requested via --profile[=FILE] in argv or $BRICK_PROFILE (None = off)."""
+    for arg in argv:
+        if arg == '--profile':
+            return DEFAULT_PROFILE
+        if arg.startswith('--profile='):
+            return arg.split('=', 1)[1]
+    return os.environ.get(ENV_VAR) or None
+
+
+def start(name):
+    """Begin collecting a report for one logo."""
+    global _report
+    _report = {'name': name, 'stages': {}, 'counters': {}, 'outputs': {}, '_start': time.perf_counter()}
+
+
+def finish():
+    """Stop collecting and return the report (None if none was active)."""
+    global _report
+    report, _report = _report, None
+    if report is not None:
+        report['total_seconds'] = time.perf_counter() - report.pop('_start')
+    return report
+
+
+def enabled():
+    """True while a report is being collected."""
+    return _report is not None
+
+
+def add_time(name, seconds):
+    """Add seconds to a stage (stages may be entered several times)."""
+    if _report is not None:
+        _report['stages'][name] = _report['stages'].get(name, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the enclosed block as stage name."""
+    if _report is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start_time)
+
+
+def count(name, n=1):
+    """Increase a counter."""
+    if _report is not None:
+        _report['counters'][name] = _report['counters'].get(name, 0) + n
+
+
+def output(path):
+    """Record the size of a written output file."""
+    if _report is not None:
+        _report['outputs'][path] = os.path.getsize(path)
+
+
+def summarize(reports):
+    """Sum stage times, counters and output bytes over several reports."""
+    summary = {'stages': {}, 'counters': {}, 'output_bytes': 0, 'total_seconds': 0.0}
+    for report in reports:
+        for name, seconds in report['stages'].items():
+            summary['stages'][name] = summary['stages'].get(name, 0.0) + seconds
+        for name, value in report['counters'].items():
+            summary['counters'][name] = summary['counters'].get(name, 0) + value
+        summary['output_bytes'] += sum(report['outputs'].values())
+        summary['total_seconds'] += report['total_seconds']
+    return summary
+
+
+def write(path, reports):
+    """Write the reports of a run (plus their summary) as JSON."""
+    with open(path, 'w') as f:
+        json.dump({'reports': reports, 'summary': summarize(reports)}, f, indent=2)
+    print(f"Profile written to {path}")
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Local HTTP render service for brick logos.
+
+Serves brick versions of the logos in a batch manifest at any pixel width,
+brick type and output size, rendered on demand:
+
+    GET /                         JSON list of logos and their default settings
+    GET /render?logo=spy-square-black&pixel_width=40&format=png&width=400
+
+Query parameters are those of the manifest (pixel_width, block_width,
+block_height, brick_type, symbols, cull, compact, precision, webp_effort)
+plus format (svg, svgz, png, webp) and width (PNG/WebP width in pixels);
+anything left out defaults to the logo's manifest settings. Rendering runs on a process
+pool, so slow renders do not hold up other requests. Identical requests
+in flight share one render. Responses are kept in a size-bounded LRU in the
+server, and each worker keeps the low-res rasters and brick layouts of its
+recent renders. ETags are derived from the input bytes, settings and tool
+version, so a revalidation is answered with 304 Not Modified without
+rendering anything. The server only listens on the loopback interface.
+"""
+
+import sys
+import asyncio
+import collections
+import contextlib
+import gzip
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import cairosvg
+from PIL import Image
+
+import brick_batch
+import brick_cache
+import brick_palette
+from brick_blockify import (brick_svg_size, encode_raster, image_to_arrays, iter_brick_svg, iter_brick_svg_elements,
+                            quantize_and_pack, rasterize_and_pack, render_brick_raster)
+from brick_blockify_full import extract_title_and_subtitle, iter_full_logo_svg
+
+
+HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024  # bytes of rendered responses kept in memory
+
+# Low-res rasters and layouts kept per worker process
+MAX_WORKER_LAYOUTS = 32
+
+# Upper bounds of request parameters (a request is rendered in full before it is sent)
+MAX_PIXEL_WIDTH = 400
+MAX_BLOCK_SIZE = 96
+
+# Smallest block height that leaves rows of bricks apart: the 2px studs and the
+# 2px inner studs below them leave 1px between rows (see brick_svg_size)
+MIN_BLOCK_HEIGHT = 5
+MAX_RASTER_WIDTH = 4096
+
+FORMATS = {
+    'svg': 'image/svg+xml',
+    'svgz': 'image/svg+xml',
+    'png': 'image/png',
+    'webp': 'image/webp',
+}
+BRICK_TYPES = ('auto', 'optimal', '1x1', '2x2')
+STATUS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          500: 'Internal Server Error'}
+
+# Packed title/logo images of this worker: key -> (img, brick_sizes, full logo parts or None)
+_worker_layouts = collections.OrderedDict()
+# Colour-variant layouts shared by this worker's renders (see variant_brick_grid)
+_worker_variants = {}
+
+
+def load_logos(manifest_path):
+    """Logos of a batch manifest by name, with their manifest settings.
+
+    Returns:
+        Dict of logo name -> job dict (see brick_batch.load_manifest)
+    """
+    logos = {}
+    for job in brick_batch.load_manifest(manifest_path):
+        logos.setdefault(job['name'], job)
+    return logos
+
+
+def flag(value):
+    """Boolean query parameter: 1/true/yes/on or 0/false/no/off."""
+    if value.lower() in ('1', 'true', 'yes', 'on', ''):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"Invalid flag value: {value!r}")
+
+
+def bounded_int(query, name, default, low, high):
+    """Integer query parameter within [low, high]."""
+    if name not in query:
+        return default
+    value = int(query[name])
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
+def render_params(query, job):
+    """Validated render settings of a request, defaults taken from the logo's manifest job.
+
+    Raises:
+        ValueError: For unknown or out-of-range parameters
+    """
+    known = {'logo', 'format', 'width', 'pixel_width', 'block_width', 'block_height', 'brick_type', 'symbols',
+             'cull', 'compact', 'precision', 'webp_effort'}
+    unknown = sorted(set(query) - known)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {', '.join(unknown)}")
+
+    pixel_width = job['pixel_width'][0] if isinstance(job['pixel_width'], list) else job['pixel_width']
+    params = {
+        'format': query.get('format', 'svg'),
+        'pixel_width': bounded_int(query, 'pixel_width', pixel_width, 1, MAX_PIXEL_WIDTH),
+        'block_width': bounded_int(query, 'block_width', job['block_width'], 2, MAX_BLOCK_SIZE),
+        'block_height': bounded_int(query, 'block_height', job['block_height'], MIN_BLOCK_HEIGHT, MAX_BLOCK_SIZE),
+        'brick_type': query.get('brick_type', job['brick_type']),
+        'width': bounded_int(query, 'width', job['raster_width'], 1, MAX_RASTER_WIDTH),
+        'symbols': flag(query['symbols']) if 'symbols' in query else job['symbols'],
+        'cull': flag(query['cull']) if 'cull' in query else job['cull'],
+        'compact': flag(query['compact']) if 'compact' in query else job['compact'],
+        'precision': bounded_int(query, 'precision', job['precision'], 0, 6),
+        'full': job['full'],
+        'palette': job['palette'],
+        'webp_effort': bounded_int(query, 'webp_effort', job['webp_effort'], 0, 6),
+    }
+    if params['format'] not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if params['brick_type'] not in BRICK_TYPES:
+        raise ValueError(f"brick_type must be one of {', '.join(BRICK_TYPES)}")
+    if params['block_width'] % 2:
+        raise ValueError("block_width must be even (1x1 bricks are half a 2x2 brick)")
+    return params
+
+
+def read_input(path):
+    """Bytes of a logo's input file and their digest.
+
+    The ETag and the render both come from these bytes, so a response always
+    matches its ETag even when the file is rewritten meanwhile.
+
+    Returns:
+        (data, digest)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, brick_cache.data_digest(data)
+
+
+def packed_logo(input_path, data, digest, params):
+    """Low-res image and brick layout of a logo, reusing this worker's recent results.
+
+    Args:
+        input_path: Input file of the logo (its extension tells SVG from raster input)
+        data, digest: Contents of the input file and their digest (see read_input)
+
+    Returns:
+        (img, brick_sizes, full) - full holds the subtitle parts of a full logo
+        (see extract_title_and_subtitle), None otherwise
+    """
+    brick_type = 'auto' if params['full'] else params['brick_type']
+    key = (digest, params['full'], params['pixel_width'], params['block_width'], brick_type, params['palette'])
+    if key in _worker_layouts:
+        _worker_layouts.move_to_end(key)
+        return _worker_layouts[key]
+
+    if params['full']:
+        title_svg_data, subtitle_elements, original_viewbox, title_bottom_y = extract_title_and_subtitle(
+            io.BytesIO(data))
+        img, brick_sizes = rasterize_and_pack(title_svg_data, params['pixel_width'], params['block_width'],
+                                              brick_type, variant_layouts=_worker_variants)
+        full = (subtitle_elements, original_viewbox, title_bottom_y)
+    elif brick_palette.is_raster_input(input_path):
+        img, brick_sizes = quantize_and_pack(io.BytesIO(data), params['pixel_width'], params['block_width'],
+                                             brick_type, params['palette'], _worker_variants)
+        full = None
+    else:
+        img, brick_sizes = rasterize_and_pack(data, params['pixel_width'], params['block_width'], brick_type,
+                                              variant_layouts=_worker_variants)
+        full = None
+
+    _worker_layouts[key] = (img, brick_sizes, full)
+    while len(_worker_layouts) > MAX_WORKER_LAYOUTS:
+        _worker_layouts.popitem(last=False)
+    return img, brick_sizes, full
+
+
+def full_logo_svg(img, brick_sizes, full, params):
+    """SVG bytes of a full logo (brick title with vector subtitle), built in memory."""
+    block_width, block_height = params['block_width'], params['block_height']
+    brick_elements = iter_brick_svg_elements(img, block_width, block_height, brick_type='auto',
+                                             symbols=params['symbols'], cull=params['cull'], brick_sizes=brick_sizes,
+                                             compact=params['compact'], precision=params['precision'])
+    brick_size = brick_svg_size(img.width, img.height, block_width, block_height)[:2]
+    lines = iter_full_logo_svg(brick_elements, brick_size, *full, symbols=params['symbols'])
+    return ''.join(line + '\n' for line in lines).encode('utf-8')
+
+
+def render_logo(input_path, data, digest, params):
+    """Render one logo in a worker process (arguments as for packed_logo).
+
+    Returns:
+        Response body bytes in params['format']
+    """
+    # Progress output of the pipeline is meant for the command line
+    with contextlib.redirect_stdout(io.StringIO()):
+        img, brick_sizes, full = packed_logo(input_path, data, digest, params)
+        fmt = params['format']
+        block_width, block_height = params['block_width'], params['block_height']
+
+        if full is not None:
+            svg_data = full_logo_svg(img, brick_sizes, full, params)
+            if fmt in ('png', 'webp'):
+                # The vector subtitle is only in the SVG, so full logos are rasterized from it
+                png_data = cairosvg.svg2png(bytestring=svg_data, output_width=params['width'])
+                return encode_raster(Image.open(io.BytesIO(png_data)), fmt, params['webp_effort'])
+        elif fmt in ('png', 'webp'):
+            width = params['width'] or brick_svg_size(img.width, img.height, block_width, block_height)[0]
+            _, rgb = image_to_arrays(img)
+            raster = render_brick_raster(brick_sizes, rgb, width, block_width, block_height, cull=params['cull'])
+            return encode_raster(raster, fmt, params['webp_effort'])
+        else:
+            lines = iter_brick_svg(img, block_width=block_width, block_height=block_height,
+                                   brick_type=params['brick_type'], symbols=params['symbols'], cull=params['cull'],
+                                   brick_sizes=brick_sizes, compact=params['compact'], precision=params['precision'])
+            svg_data = '\n'.join(lines).encode('utf-8')
+
+    return gzip.compress(svg_data) if fmt == 'svgz' else svg_data
+
+
+def response(status, body=b'', headers=None, head=False):
+    """HTTP/1.1 response bytes (the connection is closed after each response)."""
+    lines = [f'HTTP/1.1 {status} {STATUS[status]}', f'Content-Length: {len(body)}', 'Connection: close']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (b'' if head else body)
+
+
+def error_response(status, message, head=False):
+    """Plain text error response."""
+    return response(status, (message + '\n').encode('utf-8'), {'Content-Type': 'text/plain; charset=utf-8'}, head)
+
+
+def serve(manifest_path='brick_variants.json', port=DEFAULT_PORT, workers=None, cache_size=DEFAULT_CACHE_SIZE):
+    """Run the render service on localhost until interrupted.
+
+    Args:
+        manifest_path: Batch manifest naming the logos that can be rendered
+        port: TCP port on 127.0.0.1
+        workers: Render worker processes (default: CPU count)
+        cache_size: Bytes of rendered responses kept in memory
+    """
+    logos = load_logos(manifest_path)
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    results = collections.OrderedDict()  # etag -> response body
+    cached_bytes = 0
+    in_flight = {}  # etag -> future of a render in progress
+
+    async def rendered(etag, job, data, digest, params):
+        nonlocal cached_bytes
+        if etag in results:
+            results.move_to_end(etag)
+            return results[etag]
+        if etag not in in_flight:
+            loop = asyncio.get_running_loop()
+            in_flight[etag] = loop.run_in_executor(pool, render_logo, job['input'], data, digest, params)
+        try:
+            body = await asyncio.shield(in_flight[etag])
+        finally:
+            if etag in in_flight and in_flight[etag].done():
+                del in_flight[etag]
+
+        if etag not in results:
+            results[etag] = body
+            cached_bytes += len(body)
+            while cached_bytes > cache_size and len(results) > 1:
+                _, old_body = results.popitem(last=False)
+                cached_bytes -= len(old_body)
+        return body
+
+    async def handle_render(query, headers, head):
+        if 'logo' not in query:
+            return error_response(400, "Missing parameter: logo", head)
+        job = logos.get(query['logo'])
+        if job is None:
+            return error_response(404, f"Unknown logo: {query['logo']}", head)
+        try:
+            params = render_params(query, job)
+        except ValueError as error:
+            return error_response(400, str(error), head)
+
+        # The input may be briefly missing or half-written while it is regenerated
+        try:
+            data, digest = await asyncio.get_running_loop().run_in_executor(None, read_input, job['input'])
+        except FileNotFoundError:
+            return error_response(404, f"Input of {query['logo']} not found: {job['input']}", head)
+        except OSError as error:
+            return error_response(500, f"Reading the input of {query['logo']} failed: {error}", head)
+        etag = '"' + brick_cache.cache_key('serve', digest, params)[:32] + '"'
+        cache_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+            return response(304, headers=cache_headers, head=True)
+
+        try:
+            body = await rendered(etag, job, data, digest, params)
+        except Exception as error:
+            return error_response(500, f"Rendering {query['logo']} failed: {error}", head)
+
+        headers = dict(cache_headers, **{'Content-Type': FORMATS[params['format']]})
+        if params['format'] == 'svgz':
+            headers['Content-Encoding'] = 'gzip'
+        return response(200, body, headers, head)
+
+    async def handle(reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) != 3:
+                reply = error_response(400, "Malformed request")
+            elif request_line[0] not in ('GET', 'HEAD'):
+                reply = error_response(405, "Only GET and HEAD are supported")
+            else:
+                head = request_line[0] == 'HEAD'
+                url = urlsplit(request_line[1])
+                query = {name: values[-1] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+                if url.path == '/':
+                    listing = {name: {key: job[key] for key in brick_batch.RENDER_KEYS}
+                               for name, job in sorted(logos.items())}
+                    reply = response(200, json.dumps(listing, indent=2).encode('utf-8'),
+                                     {'Content-Type': 'application/json'}, head)
+                elif url.path == '/render':
+                    reply = await handle_render(query, headers, head)
+                else:
+                    reply = error_response(404, f"Not found: {url.path}", head)
+                print(f"{request_line[0]} {request_line[1]} {reply.split(b' ', 2)[1].decode()}")
+
+            writer.write(reply)
+            await writer.drain()
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, HOST, port)
+        print(f"Serving {len(logos)} logo(s) from {manifest_path} on http://{HOST}:{port}/ - Ctrl+C to stop")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+
+
+def main(argv):
+    """Command line entry point: [manifest.json] [--port=N] [--workers=N] [--cache-size=MB]"""
+    args = [arg for arg in argv if not arg.startswith('--')]
+    port = DEFAULT_PORT
+    workers = None
+    cache_size = DEFAULT_CACHE_SIZE
+    for arg in argv:
+        if arg.startswith('--port='):
+            port = int(arg.split('=', 1)[1])
+        elif arg.startswith('--workers='):
+            workers = int(arg.split('=', 1)[1])
+        elif arg.startswith('--cache-size='):
+            cache_size = int(float(arg.split('=', 1)[1]) * 1024 * 1024)
+        elif arg in ('-h', '--help'):
+            print("Usage: python brick_serve.py [manifest.json] [--port=N] [--workers=N] [--cache-size=MB]")
+            print("  Serve brick logos rendered on demand on http://127.0.0.1:PORT/")
+            print("  manifest.json: Logos that can be rendered and their defaults (default: brick_variants.json)")
+            print(f"  --port=N: Port on the loopback interface (default: {DEFAULT_PORT})")
+            print("  --workers=N: Render worker processes (default: CPU count)")
+            print(f"  --cache-size=MB: Memory for rendered responses (default: {DEFAULT_CACHE_SIZE // (1024 * 1024)})")
+            print("  Example: curl 'http://127.0.0.1:8765/render?logo=spy-square-black&pixel_width=40&format=png'")
+            sys.exit(1)
+
+    try:
+        serve(args[0] if args else 'brick_variants.json', port, workers, cache_size)
+    except KeyboardInterrupt:
+        print("")
+        print("Stopped serving")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
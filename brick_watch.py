@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Watch mode: regenerate brick variants while their sources are edited.
+
+Keeps one interpreter running with NumPy, PIL and cairosvg loaded, polls
+the inputs of a batch manifest (the outlined SVGs) and the editable source
+SVGs they are outlined from, and reruns only the jobs whose input changed.
+A changed source is outlined again through `make outlined` (Inkscape only
+runs for the stale files); the resulting outlined SVG is then picked up
+like any other changed input. Brick layouts of colour variants stay in
+memory between rebuilds and the content-addressed build cache restores
+outputs of inputs seen before (e.g. after an undo).
+"""
+
+import sys
+import glob
+import os
+import subprocess
+import time
+import traceback
+
+import brick_batch
+import brick_cache
+
+
+DEFAULT_INTERVAL = 0.25  # seconds between polls
+
+# Editable source SVGs (outlined by `make outlined`)
+SOURCE_GLOBS = ('logo/horizontal/svg/*.svg', 'logo/square/svg/*.svg')
+
+# Colour-variant layouts kept in memory (oldest dropped first)
+MAX_VARIANT_LAYOUTS = 64
+
+
+def snapshot(paths):
+    """Modification time and size of every existing path, to detect changes."""
+    stats = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stats[path] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+def input_digest(path):
+    """Digest of a file's contents, or None if it cannot be read right now.
+
+    Editors that save atomically briefly remove or replace the file.
+    """
+    try:
+        return brick_cache.file_digest(path)
+    except OSError:
+        return None
+
+
+def changed_paths(before, after):
+    """Paths that are new or differ between two snapshots."""
+    return sorted(path for path, stat in after.items() if before.get(path) != stat)
+
+
+def source_paths():
+    """All editable source SVGs."""
+    return sorted(path for pattern in SOURCE_GLOBS for path in glob.glob(pattern))
+
+
+def outline_sources(paths):
+    """Regenerate the outlined SVGs of changed sources through the Makefile."""
+    print(f"Source changed: {', '.join(paths)} - outlining...")
+    result = subprocess.run(['make', '--no-print-directory', 'outlined'])
+    if result.returncode != 0:
+        print(f"  make outlined failed (exit code {result.returncode})")
+
+
+def rebuild(jobs, raster=True, cache_dir=None, variant_layouts=None):
+    """Rerun jobs, reporting errors without stopping the watch.
+
+    A file caught halfway through being saved may not parse; it is built
+    again on its next change.
+    """
+    start = time.perf_counter()
+    for job in jobs:
+        print(f"Processing: {job['group']}/{job['name']}")
+        try:
+            brick_batch.run_job(job, raster=raster, cache_dir=cache_dir, variant_layouts=variant_layouts)
+        except Exception:
+            traceback.print_exc()
+            print(f"  Failed to build {job['name']}, waiting for the next change")
+    print(f"=== Rebuilt {len(jobs)} logo(s) in {time.perf_counter() - start:.2f}s ===")
+
+
+def watch(manifest_path, groups=None, raster=True, cache_dir=brick_cache.DEFAULT_CACHE_DIR,
+          interval=DEFAULT_INTERVAL, outline=True, max_polls=None):
+    """Poll the manifest inputs and sources, rebuilding affected jobs until interrupted.
+
+    Args:
+        manifest_path: Batch manifest (see brick_batch.load_manifest); edits to it
+            rerun every job
+        groups: Optional list of manifest groups to watch (default: all)
+        raster: Also export PNG/WebP
+        cache_dir: Build cache directory (None = no cache)
+        interval: Seconds between polls
+        outline: Run `make outlined` when an editable source SVG changes
+        max_polls: Stop after this many polls (None = run until interrupted)
+    """
+    jobs = brick_batch.load_manifest(manifest_path, groups)
+    stats = snapshot({job['input'] for job in jobs})
+    digests = {path: input_digest(path) for path in stats}
+    # Inputs that cannot be read yet count as new on the first poll
+    stats = {path: stat for path, stat in stats.items() if digests[path] is not None}
+    sources = snapshot(source_paths()) if outline else {}
+    manifest_stat = snapshot([manifest_path])
+    variant_layouts = {}
+    manifest_error = None
+    print(f"Watching {len(stats)} input(s) from {manifest_path}"
+          + (f" and {len(sources)} source SVG(s)" if outline else "") + " - Ctrl+C to stop")
+
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        time.sleep(interval)
+        polls += 1
+
+        if outline:
+            new_sources = snapshot(source_paths())
+            changed = changed_paths(sources, new_sources)
+            sources = new_sources
+            if changed:
+                outline_sources(changed)
+
+        # Expanded on every poll, so new input files are picked up as well
+        try:
+            jobs = brick_batch.load_manifest(manifest_path, groups)
+        except (OSError, ValueError, KeyError) as error:
+            # Also while the manifest itself is being saved
+            if repr(error) != manifest_error:
+                manifest_error = repr(error)
+                print(f"Manifest {manifest_path} cannot be loaded ({manifest_error}), waiting for the next change")
+            continue
+        manifest_error = None
+        new_stats = snapshot({job['input'] for job in jobs})
+
+        # Inputs caught mid-save: left out of the snapshot, so they are read again on the next poll
+        unreadable = set()
+        new_manifest_stat = snapshot([manifest_path])
+        if new_manifest_stat != manifest_stat:
+            # Settings may have changed for any job: rerun all (unchanged outputs come from the cache)
+            manifest_stat = new_manifest_stat
+            digests = {path: input_digest(path) for path in new_stats}
+            unreadable = {path for path, digest in digests.items() if digest is None}
+            changed = sorted(set(digests) - unreadable)
+            print(f"Manifest changed - {len(jobs)} logo(s)")
+        else:
+            changed = []
+            for path in changed_paths(stats, new_stats):
+                # Editors often rewrite files unchanged: only content changes count
+                digest = input_digest(path)
+                if digest is None:
+                    unreadable.add(path)
+                    continue
+                if digests.get(path) != digest:
+                    digests[path] = digest
+                    changed.append(path)
+            if changed:
+                print(f"Changed: {', '.join(changed)}")
+        stats = {path: stat for path, stat in new_stats.items() if path not in unreadable}
+        if not changed:
+            continue
+
+        rebuild([job for job in jobs if job['input'] in changed], raster, cache_dir, variant_layouts)
+        for key in list(variant_layouts)[:-MAX_VARIANT_LAYOUTS]:
+            del variant_layouts[key]
+        if cache_dir:
+            brick_cache.evict(cache_dir)
+
+
+def main(argv):
+    """Command line entry point: [manifest.json] [group ...] [--svg-only] [--interval=S] ..."""
+    args = []
+    raster = True
+    outline = True
+    interval = DEFAULT_INTERVAL
+    cache_dir = brick_cache.DEFAULT_CACHE_DIR
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--svg-only':
+            raster = False
+        elif arg == '--no-outline':
+            outline = False
+        elif arg.startswith('--interval='):
+            interval = float(arg.split('=', 1)[1])
+        elif arg == '--no-cache':
+            cache_dir = None
+        elif arg == '--cache' and i + 1 < len(argv):
+            cache_dir = argv[i + 1]
+            i += 1
+        elif arg in ('-h', '--help'):
+            print("Usage: python brick_watch.py [manifest.json] [group ...] [--svg-only] [--no-outline]")
+            print("                             [--interval=S] [--cache DIR | --no-cache]")
+            print("  manifest.json: Batch manifest to watch (default: brick_variants.json)")
+            print("  group: Only watch the named manifest groups (default: all)")
+            print("  --svg-only: Skip PNG/WebP export")
+            print("  --no-outline: Do not run `make outlined` when a source SVG changes")
+            print(f"  --interval=S: Seconds between polls (default: {DEFAULT_INTERVAL})")
+            print(f"  --cache DIR: Build cache directory (default: {brick_cache.DEFAULT_CACHE_DIR})")
+            print("  --no-cache: Do not use the build cache")
+            sys.exit(1)
+        else:
+            args.append(arg)
+        i += 1
+
+    manifest_path = args[0] if args else 'brick_variants.json'
+    try:
+        watch(manifest_path, args[1:], raster=raster, cache_dir=cache_dir, interval=interval, outline=outline)
+    except KeyboardInterrupt:
+        print("")
+        print("Stopped watching")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
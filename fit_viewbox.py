@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Fit the viewBox of outlined SVGs to their drawing, with a margin.
+
+After Inkscape has converted the text of a logo to paths, the page still
+has the size of the source document. This computes the bounds of the
+drawing from the path geometry (exact Bézier extrema, arcs as Béziers,
+transforms and stroke widths included) and rewrites viewBox, width and height of the
+root <svg> element so the page is the drawing plus a margin on every side.
+All files are fitted in one process, without launching Inkscape again to
+query the bounds. Only the root element's start tag is rewritten; the rest
+of the file is left byte for byte as Inkscape wrote it.
+"""
+
+import sys
+import math
+import re
+import xml.etree.ElementTree as ET
+
+
+DEFAULT_MARGIN = 10
+
+# Elements whose contents are never drawn directly
+HIDDEN_TAGS = {'defs', 'clipPath', 'mask', 'marker', 'pattern', 'symbol', 'metadata', 'namedview', 'style',
+               'title', 'desc', 'linearGradient', 'radialGradient', 'filter', 'script'}
+
+NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+PATH_TOKEN = re.compile(r'[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+ROOT_TAG = re.compile(r'<svg\b[^>]*>', re.S)
+
+# Number of parameters per path command
+PATH_ARGS = {'m': 2, 'l': 2, 'h': 1, 'v': 1, 'c': 6, 's': 4, 'q': 4, 't': 2, 'a': 7, 'z': 0}
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def local_name(tag):
+    """Tag without its XML namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def multiply(m1, m2):
+    """Compose two affine matrices (a, b, c, d, e, f): m2 applied first, then m1."""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2, a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def parse_transform(text):
+    """Parse an SVG transform attribute into an affine matrix."""
+    matrix = IDENTITY
+    for name, args in re.findall(r'(\w+)\s*\(([^)]*)\)', text or ''):
+        values = [float(value) for value in NUMBER.findall(args)]
+        if name == 'matrix':
+            step = tuple(values)
+        elif name == 'translate':
+            step = (1, 0, 0, 1, values[0], values[1] if len(values) > 1 else 0)
+        elif name == 'scale':
+            step = (values[0], 0, 0, values[1] if len(values) > 1 else values[0], 0, 0)
+        elif name == 'rotate':
+            angle = math.radians(values[0])
+            cx, cy = values[1:3] if len(values) > 2 else (0, 0)
+            cos, sin = math.cos(angle), math.sin(angle)
+            step = (cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy)
+        elif name == 'skewX':
+            step = (1, 0, math.tan(math.radians(values[0])), 1, 0, 0)
+        elif name == 'skewY':
+            step = (1, math.tan(math.radians(values[0])), 0, 1, 0, 0)
+        else:
+            raise ValueError(f"Unsupported transform: {name}")
+        matrix = multiply(matrix, step)
+    return matrix
+
+
+def apply(matrix, x, y):
+    """Transform a point."""
+    a, b, c, d, e, f = matrix
+    return a * x + c * y + e, b * x + d * y + f
+
+
+def bezier_extrema(p0, p1, p2, p3=None):
+    """Parameters in (0, 1) where a quadratic (p3=None) or cubic Bézier coordinate has a local extremum."""
+    if p3 is None:
+        denominator = p0 - 2 * p1 + p2
+        return [(p0 - p1) / denominator] if denominator and 0 < (p0 - p1) / denominator < 1 else []
+
+    # Roots of the derivative a t² + b t + c
+    a = -p0 + 3 * p1 - 3 * p2 + p3
+    b = 2 * (p0 - 2 * p1 + p2)
+    c = p1 - p0
+    if abs(a) < 1e-12:
+        roots = [-c / b] if b else []
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            return []
+        root = math.sqrt(discriminant)
+        roots = [(-b + root) / (2 * a), (-b - root) / (2 * a)]
+    return [t for t in roots if 0 < t < 1]
+
+
+def bezier_point(points, t):
+    """Point of a Bézier curve given by its control points, by de Casteljau."""
+    while len(points) > 1:
+        points = [(x0 + (x1 - x0) * t, y0 + (y1 - y0) * t) for (x0, y0), (x1, y1) in zip(points, points[1:])]
+    return points[0]
+
+
+def segment_points(segment):
+    """End points and extreme points of a segment: a single point, or the control points of a Bézier."""
+    if len(segment) == 1:
+        return segment
+    p3x = p3y = None
+    if len(segment) == 4:
+        p3x, p3y = segment[3]
+    ts = bezier_extrema(segment[0][0], segment[1][0], segment[2][0], p3x)
+    ts += bezier_extrema(segment[0][1], segment[1][1], segment[2][1], p3y)
+    return [segment[0], segment[-1]] + [bezier_point(segment, t) for t in ts]
+
+
+def arc_segments(x1, y1, rx, ry, rotation, large_arc, sweep, x2, y2):
+    """An elliptical arc (SVG endpoint parameterization) as cubic Bézier segments of at most 90°."""
+    rx, ry = abs(rx), abs(ry)
+    if not rx or not ry or (x1, y1) == (x2, y2):
+        return [[(x2, y2)]]
+
+    # Centre parameterization (SVG 1.1, appendix F.6.5)
+    phi = math.radians(rotation)
+    cos, sin = math.cos(phi), math.sin(phi)
+    dx, dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p, y1p = cos * dx + sin * dy, -sin * dx + cos * dy
+    scale = x1p * x1p / (rx * rx) + y1p * y1p / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    factor = math.sqrt(max(0, numerator / (rx * rx * y1p * y1p + ry * ry * x1p * x1p)))
+    if large_arc == sweep:
+        factor = -factor
+    cxp, cyp = factor * rx * y1p / ry, -factor * ry * x1p / rx
+    cx = cos * cxp - sin * cyp + (x1 + x2) / 2
+    cy = sin * cxp + cos * cyp + (y1 + y2) / 2
+
+    start = math.atan2((y1p - cyp) / ry, (x1p - cxp) / rx)
+    delta = math.atan2((-y1p - cyp) / ry, (-x1p - cxp) / rx) - start
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+
+    def point(theta, k=0.0):
+        # Point on the ellipse, moved k times the tangent
+        ex = rx * (math.cos(theta) - k * math.sin(theta))
+        ey = ry * (math.sin(theta) + k * math.cos(theta))
+        return cx + cos * ex - sin * ey, cy + sin * ex + cos * ey
+
+    count = max(1, math.ceil(abs(delta) / (math.pi / 2) - 1e-9))
+    step = delta / count
+    k = 4 / 3 * math.tan(step / 4)
+    segments = []
+    for i in range(count):
+        theta1 = start + i * step
+        theta2 = theta1 + step
+        end = (x2, y2) if i == count - 1 else point(theta2)
+        segments.append([point(theta1), point(theta1, k), point(theta2, -k), end])
+    return segments
+
+
+def path_segments(d):
+    """Outline of path data d as a list of segments in path coordinates.
+
+    Each segment is a single point (move/line end points) or the control
+    points of a quadratic or cubic Bézier starting at the current point;
+    arcs are converted to cubic Béziers.
+    """
+    tokens = PATH_TOKEN.findall(d or '')
+    segments = []
+    x = y = start_x = start_y = 0.0
+    last_control = None
+    previous = ''
+    command = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        elif command is None:
+            raise ValueError(f"Path data does not start with a command: {d[:40]!r}")
+        lower = command.lower()
+        count = PATH_ARGS[lower]
+        args = [float(value) for value in tokens[i:i + count]]
+        if len(args) < count:
+            break
+        i += count
+        relative = command.islower()
+        ox, oy = (x, y) if relative else (0.0, 0.0)
+
+        if lower == 'z':
+            x, y = start_x, start_y
+            last_control = None
+            # Only a new command may follow closepath
+            command = None
+        elif lower == 'm':
+            x, y = ox + args[0], oy + args[1]
+            start_x, start_y = x, y
+            segments.append([(x, y)])
+            # Further coordinate pairs are implicit lineto commands
+            command = 'l' if relative else 'L'
+            last_control = None
+        elif lower in 'lhv':
+            if lower == 'h':
+                x = ox + args[0]
+            elif lower == 'v':
+                y = oy + args[0]
+            else:
+                x, y = ox + args[0], oy + args[1]
+            segments.append([(x, y)])
+            last_control = None
+        elif lower in 'cs':
+            if lower == 'c':
+                c1 = (ox + args[0], oy + args[1])
+                args = args[2:]
+            else:
+                c1 = (2 * x - last_control[0], 2 * y - last_control[1]) \
+                    if last_control and previous in 'cs' else (x, y)
+            c2 = (ox + args[0], oy + args[1])
+            end = (ox + args[2], oy + args[3])
+            segments.append([(x, y), c1, c2, end])
+            x, y = end
+            last_control = c2
+        elif lower in 'qt':
+            if lower == 'q':
+                c1 = (ox + args[0], oy + args[1])
+                args = args[2:]
+            else:
+                c1 = (2 * x - last_control[0], 2 * y - last_control[1]) \
+                    if last_control and previous in 'qt' else (x, y)
+            end = (ox + args[0], oy + args[1])
+            segments.append([(x, y), c1, end])
+            x, y = end
+            last_control = c1
+        else:
+            end = (ox + args[5], oy + args[6])
+            segments += arc_segments(x, y, args[0], args[1], args[2], args[3] != 0, args[4] != 0, *end)
+            x, y = end
+            last_control = None
+        previous = lower
+    return segments
+
+
+def element_style(element):
+    """Presentation attributes of an element, overridden by its style attribute."""
+    style = dict(element.attrib)
+    for declaration in element.get('style', '').split(';'):
+        if ':' in declaration:
+            key, value = declaration.split(':', 1)
+            style[key.strip()] = value.strip()
+    return style
+
+
+def length(value, default=0.0):
+    """Numeric value of a length attribute (units other than px are not expected in outlined logos)."""
+    match = NUMBER.match(value.strip()) if value else None
+    return float(match.group(0)) if match else default
+
+
+def shape_segments(element, tag):
+    """Outline segments (as from path_segments) of a drawable element; empty for anything else."""
+    get = lambda name: length(element.get(name))
+    if tag == 'path':
+        return path_segments(element.get('d'))
+    if tag == 'rect':
+        x, y, width, height = get('x'), get('y'), get('width'), get('height')
+        if width <= 0 or height <= 0:
+            return []
+        return [[(x, y)], [(x + width, y)], [(x + width, y + height)], [(x, y + height)]]
+    if tag in ('circle', 'ellipse'):
+        rx = get('r') if tag == 'circle' else get('rx')
+        ry = get('r') if tag == 'circle' else get('ry')
+        cx, cy = get('cx'), get('cy')
+        if rx <= 0 or ry <= 0:
+            return []
+        return arc_segments(cx - rx, cy, rx, ry, 0, False, True, cx + rx, cy) + \
+            arc_segments(cx + rx, cy, rx, ry, 0, False, True, cx - rx, cy)
+    if tag == 'line':
+        return [[(get('x1'), get('y1'))], [(get('x2'), get('y2'))]]
+    if tag in ('polyline', 'polygon'):
+        values = [float(value) for value in NUMBER.findall(element.get('points', ''))]
+        return [[point] for point in zip(values[::2], values[1::2])]
+    return []
+
+
+def drawing_bounds(root):
+    """Bounding box (x, y, width, height) of everything drawn, in root user units.
+
+    Control points are transformed before the curve extrema are found, so
+    the box stays exact under rotations and skews.
+
+    Args:
+        root: Parsed <svg> root element
+
+    Returns:
+        Bounds tuple, or None if nothing is drawn
+    """
+    box = [math.inf, math.inf, -math.inf, -math.inf]
+
+    def visit(element, matrix, inherited):
+        tag = local_name(element.tag)
+        style = element_style(element)
+        if tag in HIDDEN_TAGS or style.get('display') == 'none':
+            return
+        if element is not root:
+            matrix = multiply(matrix, parse_transform(element.get('transform')))
+        inherited = dict(inherited)
+        inherited.update({key: style[key] for key in ('stroke', 'stroke-width') if key in style})
+
+        segments = shape_segments(element, tag)
+        if segments:
+            # Strokes extend half their width beyond the outline
+            pad = 0.0
+            if inherited.get('stroke', 'none') != 'none':
+                a, b, c, d = matrix[:4]
+                pad = length(inherited.get('stroke-width'), 1.0) / 2 * math.sqrt(abs(a * d - b * c))
+            for segment in segments:
+                for x, y in segment_points([apply(matrix, px, py) for px, py in segment]):
+                    box[0] = min(box[0], x - pad)
+                    box[1] = min(box[1], y - pad)
+                    box[2] = max(box[2], x + pad)
+                    box[3] = max(box[3], y + pad)
+
+        for child in element:
+            visit(child, matrix, inherited)
+
+    visit(root, IDENTITY, {})
+    if box[0] > box[2]:
+        return None
+    return box[0], box[1], box[2] - box[0], box[3] - box[1]
+
+
+def format_number(value):
+    """Shortest decimal form of a coordinate (at most 6 significant digits, like awk)."""
+    return f'{value:.6g}'
+
+
+def set_attribute(tag, name, value):
+    """Set an attribute in an XML start tag string, replacing an existing value."""
+    pattern = re.compile(r'(\s%s\s*=\s*)(["\'])[^"\']*\2' % re.escape(name))
+    if pattern.search(tag):
+        return pattern.sub(lambda m: f'{m.group(1)}{m.group(2)}{value}{m.group(2)}', tag, count=1)
+    end = len(tag) - (2 if tag.endswith('/>') else 1)
+    return f'{tag[:end]} {name}="{value}"{tag[end:]}'
+
+
+def fit_viewbox(svg_text, margin=DEFAULT_MARGIN):
+    """Rewrite the root viewBox, width and height of an SVG document to its drawing plus margin.
+
+    Returns:
+        (new SVG text, (x, y, width, height) of the new viewBox), or (svg_text, None)
+        if the document draws nothing
+    """
+    bounds = drawing_bounds(ET.fromstring(svg_text.encode('utf-8')))
+    if bounds is None:
+        return svg_text, None
+
+    x, y, width, height = bounds
+    viewbox = (x - margin, y - margin, width + 2 * margin, height + 2 * margin)
+    match = ROOT_TAG.search(svg_text)
+    tag = set_attribute(match.group(0), 'viewBox', ' '.join(format_number(value) for value in viewbox))
+    tag = set_attribute(tag, 'width', format_number(viewbox[2]))
+    tag = set_attribute(tag, 'height', format_number(viewbox[3]))
+    return svg_text[:match.start()] + tag + svg_text[match.end():], viewbox
+
+
+def fit_file(path, margin=DEFAULT_MARGIN):
+    """Fit the viewBox of an SVG file in place.
+
+    Returns:
+        The new viewBox, or None if the file was left unchanged
+    """
+    with open(path, encoding='utf-8') as f:
+        svg_text = f.read()
+    fitted, viewbox = fit_viewbox(svg_text, margin)
+    if fitted != svg_text:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(fitted)
+    return viewbox
+
+
+if __name__ == '__main__':
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    margin = DEFAULT_MARGIN
+    for arg in sys.argv[1:]:
+        if arg.startswith('--margin='):
+            margin = float(arg.split('=', 1)[1])
+
+    if not paths:
+        print("Usage: python fit_viewbox.py [--margin=N] <file.svg> [file.svg ...]")
+        print("  Fit viewBox, width and height of each SVG to its drawing plus a margin, in place")
+        print(f"  --margin=N: Margin around the drawing in user units (default: {DEFAULT_MARGIN})")
+        sys.exit(1)
+
+    for path in paths:
+        viewbox = fit_file(path, margin)
+        if viewbox is None:
+            print(f"  {path}: nothing drawn, left unchanged")
+        else:
+            print(f"  {path}: viewBox {' '.join(format_number(value) for value in viewbox)}")
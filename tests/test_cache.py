@@ -0,0 +1,37 @@
+"""Cache entries are replaced whole, and entries that go away read as misses."""
+
+import os
+import shutil
+
+import brick_cache
+
+
+def test_store_replaces_an_existing_entry(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    key = brick_cache.cache_key('test', 1)
+    brick_cache.store(cache_dir, key, {'a.txt': b'old', 'b.txt': b'old'})
+    entry = brick_cache.store(cache_dir, key, {'a.txt': b'new'})
+
+    assert sorted(os.listdir(entry)) == ['a.txt']
+    with open(os.path.join(entry, 'a.txt'), 'rb') as f:
+        assert f.read() == b'new'
+    # Neither the staging directory nor the old entry is left behind
+    assert os.listdir(os.path.dirname(entry)) == [key]
+
+
+def test_missing_entry_is_a_miss(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    key = brick_cache.cache_key('test', 2)
+    entry = brick_cache.store(cache_dir, key, {'a.txt': b'data', 'b.txt': b'data'})
+    output = str(tmp_path / 'out' / 'a.txt')
+
+    assert brick_cache.lookup(cache_dir, key, ['a.txt', 'c.txt']) is None
+    assert brick_cache.lookup(cache_dir, key, ['a.txt', 'b.txt']) == entry
+    assert brick_cache.restore(entry, {'a.txt': output})
+
+    # Replaced or evicted by another worker between lookup and restore
+    os.unlink(os.path.join(entry, 'b.txt'))
+    assert not brick_cache.restore(entry, {'b.txt': output})
+    shutil.rmtree(entry)
+    assert not brick_cache.restore(entry, {'a.txt': output})
+    assert brick_cache.lookup(cache_dir, key, ['a.txt']) is None
@@ -0,0 +1,72 @@
+"""--cull leaves out only stud fills that the row above paints over."""
+
+import io
+import re
+from collections import Counter
+
+import cairosvg
+import numpy as np
+import pytest
+from PIL import Image
+
+from brick_blockify import brick_svg_size, compute_brick_grid, image_to_arrays, image_to_brick_svg, render_brick_raster
+
+
+def logo_image(seed, width=14, height=9):
+    """Small RGBA image: one solid color (seed None) or a few colors with transparent holes."""
+    rgba = np.full((height, width, 4), 255, dtype=np.uint8)
+    if seed is None:
+        rgba[:, :, :3] = (200, 40, 40)
+    else:
+        rng = np.random.default_rng(seed)
+        rgba[:, :, :3] = rng.integers(0, 3, (height, width, 1)) * 100
+        rgba[rng.random((height, width)) < 0.2, 3] = 0
+    return Image.fromarray(rgba, 'RGBA')
+
+
+def render_svg(svg, width):
+    png = cairosvg.svg2png(bytestring=svg.encode('utf-8'), output_width=width)
+    return np.asarray(Image.open(io.BytesIO(png)).convert('RGBA'))
+
+
+@pytest.mark.parametrize('seed', [None, 0, 1])
+@pytest.mark.parametrize('block_width, block_height', [(24, 20), (30, 24), (18, 15)])
+@pytest.mark.parametrize('brick_type', ['auto', 'optimal'])
+def test_culled_svg_drops_only_stud_fills(seed, block_width, block_height, brick_type):
+    img = logo_image(seed)
+    stats = {}
+    culled = image_to_brick_svg(img, block_width, block_height, brick_type=brick_type, cull=True, stats=stats)
+    plain = image_to_brick_svg(img, block_width, block_height, brick_type=brick_type)
+
+    removed = Counter(plain.split('\n')) - Counter(culled.split('\n'))
+    assert Counter(culled.split('\n')) - Counter(plain.split('\n')) == Counter()
+    assert sum(removed.values()) == stats['culled'] > 0
+    stud_height = max(2, int((block_height - max(2, int(block_height * 0.15))) * 0.15))
+    for element in removed:
+        assert re.fullmatch(rf'  <rect x="[\d.]+" y="[\d.]+" width="7" height="{stud_height}" fill="rgb\(\d+,\d+,\d+\)"/>',
+                            element)
+
+
+@pytest.mark.parametrize('seed', [None, 0, 1])
+@pytest.mark.parametrize('block_width, block_height', [(24, 20), (30, 24), (18, 15)])
+@pytest.mark.parametrize('symbols', [False, True])
+@pytest.mark.parametrize('scale', [1, 2])
+def test_culled_svg_renders_the_same(seed, block_width, block_height, symbols, scale):
+    # At whole multiples of the SVG size every edge falls on a pixel boundary,
+    # so anti-aliasing cannot blend a culled fill into the seam
+    img = logo_image(seed)
+    culled = image_to_brick_svg(img, block_width, block_height, symbols=symbols, cull=True)
+    plain = image_to_brick_svg(img, block_width, block_height, symbols=symbols)
+    width = brick_svg_size(img.width, img.height, block_width, block_height)[0] * scale
+    assert np.array_equal(render_svg(culled, width), render_svg(plain, width))
+
+
+@pytest.mark.parametrize('seed', [None, 0, 1])
+@pytest.mark.parametrize('brick_type', ['auto', 'optimal'])
+@pytest.mark.parametrize('output_width', [168, 500, 1600])
+def test_culled_raster_is_the_same(seed, brick_type, output_width):
+    opaque, rgb = image_to_arrays(logo_image(seed))
+    brick_sizes = compute_brick_grid(opaque, rgb, brick_type=brick_type)
+    culled = render_brick_raster(brick_sizes, rgb, output_width, cull=True)
+    plain = render_brick_raster(brick_sizes, rgb, output_width)
+    assert np.array_equal(np.asarray(culled), np.asarray(plain))
@@ -0,0 +1,45 @@
+"""fit_viewbox reproduces the committed viewBoxes of the outlined horizontal logos."""
+
+import glob
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from fit_viewbox import ROOT_TAG, fit_viewbox, set_attribute
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTLINED_SVGS = sorted(glob.glob(os.path.join(REPO_DIR, 'logo', 'horizontal', 'svg', 'outlined', '*.svg')))
+
+
+def source_page(outlined_path):
+    """Root width, height and viewBox of the source SVG an outlined logo was exported from."""
+    source_path = os.path.join(os.path.dirname(os.path.dirname(outlined_path)), os.path.basename(outlined_path))
+    root = ET.parse(source_path).getroot()
+    width, height = root.get('width'), root.get('height')
+    return width, height, root.get('viewBox', f'0 0 {width} {height}')
+
+
+@pytest.mark.parametrize('path', OUTLINED_SVGS, ids=os.path.basename)
+def test_fit_reproduces_committed_viewbox(path):
+    with open(path, encoding='utf-8') as f:
+        committed = f.read()
+
+    # The outlined SVG as Inkscape exports it, still on the source page
+    width, height, viewbox = source_page(path)
+    match = ROOT_TAG.search(committed)
+    tag = set_attribute(match.group(0), 'viewBox', viewbox)
+    tag = set_attribute(tag, 'width', width)
+    tag = set_attribute(tag, 'height', height)
+    exported = committed[:match.start()] + tag + committed[match.end():]
+    assert exported != committed
+
+    fitted, fitted_viewbox = fit_viewbox(exported, 10)
+    assert fitted == committed
+    assert fitted_viewbox is not None
+
+
+def test_fit_leaves_empty_drawings_alone():
+    svg = '<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10"><defs><rect width="5" height="5"/></defs></svg>'
+    assert fit_viewbox(svg) == (svg, None)
@@ -0,0 +1,59 @@
+""".bricks files hold the packed layout exactly, so renders from them match renders after packing."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import brick_layout
+from brick_blockify import compute_brick_grid, image_to_arrays, image_to_brick_svg
+
+
+def logo_image(seed, width=19, height=11):
+    """Small RGBA image with a few colors and transparent holes (fully transparent for seed None)."""
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        rgba[:, :, :3] = rng.integers(0, 3, (height, width, 1)) * 120
+        rgba[:, :, 3] = np.where(rng.random((height, width)) < 0.2, 0, 255)
+    return Image.fromarray(rgba, 'RGBA')
+
+
+@pytest.mark.parametrize('seed', [None, 0, 1])
+@pytest.mark.parametrize('brick_type', ['auto', 'optimal', '1x1', '2x2'])
+@pytest.mark.parametrize('block_width', [24, 30])
+@pytest.mark.parametrize('mmap', [True, False])
+def test_layout_round_trip(tmp_path, seed, brick_type, block_width, mmap):
+    opaque, rgb = image_to_arrays(logo_image(seed))
+    brick_sizes = compute_brick_grid(opaque, rgb, block_width, brick_type)
+    layout = brick_layout.layout_from_grid(brick_sizes, rgb, block_width, brick_type)
+    path = str(tmp_path / 'logo.bricks')
+    brick_layout.save_layout(layout, path)
+
+    loaded = brick_layout.load_layout(path, mmap=mmap)
+    assert loaded['size'] == layout['size']
+    assert loaded['brick_type'] == brick_type
+    assert np.array_equal(loaded['palette'], layout['palette'])
+    assert np.array_equal(np.asarray(loaded['bricks']), layout['bricks'])
+    assert np.array_equal(brick_layout.layout_brick_sizes(loaded, block_width), brick_sizes)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('brick_type', ['auto', 'optimal'])
+def test_layout_renders_like_the_packed_image(tmp_path, seed, brick_type):
+    img = logo_image(seed)
+    opaque, rgb = image_to_arrays(img)
+    brick_sizes = compute_brick_grid(opaque, rgb, brick_type=brick_type)
+    path = str(tmp_path / 'logo.bricks')
+    brick_layout.save_layout(brick_layout.layout_from_grid(brick_sizes, rgb, brick_type=brick_type), path)
+
+    layout = brick_layout.load_layout(path)
+    rendered = image_to_brick_svg(brick_layout.layout_to_image(layout), brick_type=brick_type,
+                                  brick_sizes=brick_layout.layout_brick_sizes(layout))
+    assert rendered == image_to_brick_svg(img, brick_type=brick_type, brick_sizes=brick_sizes)
+
+
+def test_load_layout_rejects_other_files(tmp_path):
+    path = tmp_path / 'logo.png'
+    logo_image(0).save(path)
+    with pytest.raises(ValueError):
+        brick_layout.load_layout(str(path))
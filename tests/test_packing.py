@@ -0,0 +1,111 @@
+"""Run splitting and banded packing give the layouts the whole-image packer would."""
+
+import itertools
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from brick_blockify import compute_brick_grid, image_to_arrays, layout_signature, split_run_optimal
+
+
+def compositions(run_length):
+    """Every way to cover a run with bricks 1-4 pixels long."""
+    if run_length == 0:
+        yield []
+        return
+    for length in range(1, min(4, run_length) + 1):
+        for rest in compositions(run_length - length):
+            yield [length] + rest
+
+
+def staggered(lengths, below):
+    """No brick repeats the length below it while more than 2 pixels of the run remain."""
+    offset = 0
+    for length in lengths:
+        if len(below) - offset > 2 and length == below[offset]:
+            return False
+        offset += length
+    return True
+
+
+def split_cases():
+    rng = np.random.default_rng(0)
+    for run_length in range(1, 13):
+        for _ in range(20):
+            yield run_length, rng.integers(0, 5, run_length).tolist(), rng.choice([None, 1, 2, 3, 4])
+
+
+@pytest.mark.parametrize('run_length, below, first_excluded', list(split_cases()))
+def test_split_run_optimal_is_a_minimal_staggered_cover(run_length, below, first_excluded):
+    lengths = split_run_optimal(run_length, below, first_excluded)
+
+    assert sum(lengths) == run_length
+    assert all(1 <= length <= 4 for length in lengths)
+    assert staggered(lengths, below)
+
+    valid = [split for split in compositions(run_length) if staggered(split, below)]
+    fewest = min(len(split) for split in valid)
+    assert len(lengths) == fewest
+    if run_length > 2 and any(len(split) == fewest and split[0] != first_excluded for split in valid):
+        assert lengths[0] != first_excluded
+
+
+# Two of the colors are similar (see colors_similar), which the "auto" rewrites look at
+LOGO_COLORS = [(0, 0, 0), (250, 250, 250), (251, 250, 250), (200, 40, 40)]
+
+
+def logo_arrays(seed, width=23, height=17, colors=LOGO_COLORS):
+    """Image of horizontal color runs of varied lengths, with transparent gaps."""
+    rng = np.random.default_rng(seed)
+    colors = np.array(colors, dtype=np.uint8)
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    for y in range(height):
+        x = 0
+        while x < width:
+            run = int(rng.integers(1, 9))
+            rgba[y, x:x + run, :3] = colors[rng.integers(len(colors))]
+            rgba[y, x:x + run, 3] = 0 if rng.random() < 0.15 else 255
+            x += run
+    return image_to_arrays(Image.fromarray(rgba, 'RGBA'))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('brick_type', ['auto', 'optimal', '1x1', '2x2'])
+@pytest.mark.parametrize('bands', [(1,), (3,), (5, 1, 7)])
+def test_banded_grid_equals_whole_image(seed, brick_type, bands):
+    opaque, rgb = logo_arrays(seed)
+    whole = compute_brick_grid(opaque, rgb, brick_type=brick_type)
+
+    state = {}
+    banded = []
+    top = 0
+    for band in itertools.cycle(bands):
+        if top >= opaque.shape[0]:
+            break
+        banded.append(compute_brick_grid(opaque[top:top + band], rgb[top:top + band], brick_type=brick_type,
+                                         state=state))
+        top += band
+    assert np.array_equal(np.concatenate(banded), whole)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('colors, same_signature', [
+    # Colour variants: the similar pair stays similar, no other pair becomes similar
+    ([(255, 255, 255), (5, 5, 5), (4, 5, 5), (55, 215, 215)], True),
+    ([(200, 40, 40), (30, 30, 30), (30, 32, 29), (0, 0, 0)], True),
+    # The similar pair drifts apart, or two other colors become similar
+    ([(0, 0, 0), (250, 250, 250), (247, 250, 250), (200, 40, 40)], False),
+    ([(0, 0, 0), (250, 250, 250), (251, 250, 250), (1, 1, 1)], False),
+])
+def test_equal_layout_signatures_give_equal_grids(seed, colors, same_signature):
+    opaque, rgb = logo_arrays(seed)
+    variant_opaque, variant_rgb = logo_arrays(seed, colors=colors)
+    assert np.array_equal(variant_opaque, opaque)
+
+    signature = layout_signature(opaque, rgb)
+    assert (layout_signature(variant_opaque, variant_rgb) == signature) == same_signature
+    if same_signature:
+        for brick_type in ('auto', 'optimal', '1x1', '2x2'):
+            assert np.array_equal(compute_brick_grid(variant_opaque, variant_rgb, brick_type=brick_type),
+                                  compute_brick_grid(opaque, rgb, brick_type=brick_type))